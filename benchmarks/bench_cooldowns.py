@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark for utils.cooldowns
+
+Times CooldownStore.hit() against a sliding window keyed by
+(command, guild, user) tuples that keeps a list of recent use times per
+key, and compares the memory both hold once many users are tracked.
+GCRA gives back one use every per / uses seconds instead of holding all
+of them for the whole window, so it limits fewer of the same calls.
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.cooldowns import CooldownStore
+
+COMMANDS = ('mock', 'play', 'poll', 'rank', 'suggest')
+
+
+class SlidingWindow:
+    def __init__(self):
+        self.uses = {}
+
+    def hit(self, command, guild_id, user_id, uses, per, now):
+        key = (command, guild_id, user_id)
+        recent = [t for t in self.uses.get(key, ()) if t > now - per]
+        if len(recent) >= uses:
+            self.uses[key] = recent
+            return recent[0] + per - now
+        recent.append(now)
+        self.uses[key] = recent
+        return 0.0
+
+
+def workload(checks, users, guilds):
+    rng = random.Random(1)
+    calls = []
+    for i in range(checks):
+        user_id = rng.randrange(users)
+        calls.append((rng.choice(COMMANDS), user_id % guilds, user_id, i * 0.0001))
+    return calls
+
+
+def run(limiter, calls):
+    limited = 0
+    hit = limiter.hit
+    start = time.perf_counter()
+    for command, guild_id, user_id, now in calls:
+        if hit(command, guild_id, user_id, 5, 10.0, now):
+            limited += 1
+    return time.perf_counter() - start, limited
+
+
+def memory(factory, calls):
+    tracemalloc.start()
+    limiter = factory()
+    for command, guild_id, user_id, now in calls:
+        limiter.hit(command, guild_id, user_id, 5, 10.0, now)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark command cooldown checks')
+    parser.add_argument('--checks', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--guilds', type=int, default=100)
+    args = parser.parse_args()
+
+    calls = workload(args.checks, args.users, args.guilds)
+    for name, factory in (('sliding window', SlidingWindow), ('GCRA store', CooldownStore)):
+        elapsed, limited = run(factory(), calls)
+        used = memory(factory, calls)
+        print(f'{name:15} {args.checks / elapsed:12,.0f} checks/s, {limited} limited, '
+              f'{used / 1024 / 1024:6.1f} MiB')
+
+    store = CooldownStore()
+    run(store, calls)
+    start = time.perf_counter()
+    store.sweep(now=calls[-1][3] + 60)
+    print(f'sweep of {store.evicted} idle keys: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Mixed read/write throughput benchmark for utils.database.Database
+
+Runs concurrent writers (ticket updates, warnings) and readers (rank
+lookups) against a file-backed database and reports throughput along with
+the worst event loop stall seen while the load was running.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.database import Database
+
+
+async def heartbeat(stop, interval=0.01):
+    """Measure the worst delay of a periodic callback, like the gateway heartbeat"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def writer(db, count, guilds):
+    for _ in range(count):
+        guild_id = random.randrange(guilds)
+        if random.random() < 0.5:
+            await db.execute('''
+                INSERT INTO warnings (guild_id, user_id, moderator_id, reason)
+                VALUES (?, ?, ?, ?)
+            ''', (guild_id, random.randrange(10_000), 1, 'benchmark'))
+        else:
+            await db.execute('''
+                UPDATE tickets SET status = 'open', closed_reason = NULL
+                WHERE ticket_id = ?
+            ''', (random.randrange(1, 1000),))
+
+
+async def reader(db, count, guilds):
+    for _ in range(count):
+        await db.fetchone('''
+            SELECT xp, level FROM users WHERE guild_id = ? AND user_id = ?
+        ''', (random.randrange(guilds), random.randrange(10_000)))
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db = Database(
+            Path(tmp) / 'bench.db',
+            read_connections=args.readers,
+            batch_size=args.batch_size,
+            batch_window=args.batch_window
+        )
+
+        # Seed data
+        await db.executemany(
+            'INSERT INTO users (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?)',
+            ((g, u, u, 1) for g in range(args.guilds) for u in range(0, 10_000, 7))
+        )
+        await db.executemany(
+            'INSERT INTO tickets (guild_id, user_id, channel_id, topic) VALUES (?, ?, ?, ?)',
+            ((0, i, i, 'bench') for i in range(1000))
+        )
+
+        stop = asyncio.Event()
+        beat = asyncio.create_task(heartbeat(stop))
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(writer(db, args.ops, args.guilds) for _ in range(args.concurrency)),
+            *(reader(db, args.ops * args.read_ratio, args.guilds) for _ in range(args.concurrency)),
+        )
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        worst_stall = await beat
+        commits, committed_writes = db.commits, db.committed_writes
+        await db.close()
+
+    writes = args.ops * args.concurrency
+    reads = args.ops * args.read_ratio * args.concurrency
+    print(f'writes:      {writes} ({writes / elapsed:,.0f}/s)')
+    print(f'reads:       {reads} ({reads / elapsed:,.0f}/s)')
+    print(f'commits:     {commits} ({committed_writes / max(commits, 1):.1f} writes/commit)')
+    print(f'elapsed:     {elapsed:.2f}s')
+    print(f'worst stall: {worst_stall * 1000:.1f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ops', type=int, default=500, help='write operations per task')
+    parser.add_argument('--read-ratio', type=int, default=4, help='reads per write')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent reader and writer tasks')
+    parser.add_argument('--readers', type=int, default=4, help='read connections in the pool')
+    parser.add_argument('--guilds', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=256, help='max writes per group commit')
+    parser.add_argument('--batch-window', type=float, default=0.002, help='max seconds to wait for a batch')
+    parser.add_argument('--dir', default=None, help='directory for the database file (use a real disk)')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Event loop latency benchmark for utils.extractor.ExtractionPool
+
+Fires many concurrent /play-style lookups through a stubbed extractor
+that blocks like yt-dlp does, once inline on the event loop (the old
+behaviour) and once through the process pool, and reports how late a
+periodic heartbeat task ran in each case.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.extractor import ExtractionPool
+
+
+def stub_extract(query, ydl_opts):
+    """Stand-in for yt-dlp: blocks for the configured time and returns track info"""
+    time.sleep(ydl_opts['stub_delay'])
+    return {'title': query, 'url': f'https://example.invalid/{query}', 'duration': 180}
+
+
+async def heartbeat(stop, samples, interval=0.02):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+def report(label, samples, elapsed, requests):
+    samples = sorted(samples) or [0.0]
+    p50 = samples[len(samples) // 2] * 1000
+    p99 = samples[int(len(samples) * 0.99)] * 1000
+    print(f'{label:<8} {requests / elapsed:6.1f} lookups/s   '
+          f'loop lag p50 {p50:7.1f}ms  p99 {p99:7.1f}ms  max {samples[-1] * 1000:7.1f}ms')
+
+
+async def run_inline(args, queries):
+    opts = {'stub_delay': args.delay}
+
+    async def play(query):
+        # What Music.play used to do: call extract_info inside the coroutine
+        return stub_extract(query, opts)
+
+    stop, samples = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, samples))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(play(query) for _, query in queries))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    report('inline', samples, elapsed, len(queries))
+
+
+async def run_pool(args, queries):
+    pool = ExtractionPool(
+        {'stub_delay': args.delay},
+        max_workers=args.workers,
+        per_guild=args.per_guild,
+        timeout=600,
+        extract_func=stub_extract
+    )
+    # Start the worker processes outside the measurement
+    await asyncio.gather(*(pool.extract(i, 'warmup') for i in range(args.workers)))
+
+    stop, samples = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, samples))
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.extract(guild_id, query) for guild_id, query in queries))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    pool.shutdown()
+    report('pool', samples, elapsed, len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=40, help='concurrent /play calls')
+    parser.add_argument('--guilds', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=0.1, help='seconds each stub extraction blocks')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--per-guild', type=int, default=1)
+    args = parser.parse_args()
+
+    queries = [(random.randrange(args.guilds), f'song {i}') for i in range(args.requests)]
+    asyncio.run(run_inline(args, queries))
+    asyncio.run(run_pool(args, queries))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Click-storm load test for utils.giveaways.GiveawayEntries
+
+Simulates a burst of enter-button clicks on one giveaway, with many users
+clicking more than once, while the periodic flush writes entries to a
+file-backed database. Reports click throughput, how many writes reached
+the database, and the time and memory used to draw winners from the
+stored entries. With --per-click the same storm is written with one
+INSERT per click, as a baseline.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.database import Database
+from utils.giveaways import GiveawayEntries
+
+GIVEAWAY_ID = 1
+
+
+async def click_storm(args, entries, clickers):
+    start = time.perf_counter()
+    for i, user_id in enumerate(clickers):
+        entries.add(GIVEAWAY_ID, user_id)
+        if i % 500 == 0:
+            # Yield like the gateway would between interactions
+            await asyncio.sleep(0)
+    return time.perf_counter() - start
+
+
+async def per_click(db, clickers):
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        db.execute('INSERT OR IGNORE INTO giveaway_entries (giveaway_id, user_id) VALUES (?, ?)', (GIVEAWAY_ID, user_id))
+        for user_id in clickers
+    ))
+    return time.perf_counter() - start
+
+
+async def run(args):
+    rng = random.Random(1)
+    # Some users click repeatedly
+    clickers = [rng.randrange(args.users) for _ in range(args.clicks)]
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db = Database(Path(tmp) / 'bench.db')
+
+        if args.per_click:
+            elapsed = await per_click(db, clickers)
+            print(f'per-click inserts: {args.clicks} clicks in {elapsed:.2f}s ({args.clicks / elapsed:,.0f}/s)')
+            await db.close()
+            return
+
+        entries = GiveawayEntries(db, flush_interval=args.flush_interval)
+        entries.start()
+        elapsed = await click_storm(args, entries, clickers)
+        flush_start = time.perf_counter()
+        await entries.stop()
+        flush_elapsed = time.perf_counter() - flush_start
+
+        stats = entries.get_stats()
+        stored = (await db.fetchone('SELECT COUNT(*) FROM giveaway_entries'))[0]
+        print(f'clicks:        {args.clicks} ({args.clicks / elapsed:,.0f}/s)')
+        print(f'entries:       {stats["entries"]} new, {stats["duplicates"]} duplicate clicks, {stored} stored')
+        print(f'writes:        {stats["flushes"]} batched inserts instead of {args.clicks} inserts '
+              f'(final flush {flush_elapsed * 1000:.1f} ms)')
+
+        start = time.perf_counter()
+        winners, count = await entries.draw(GIVEAWAY_ID, args.winners)
+        draw_elapsed = time.perf_counter() - start
+
+        # Memory of a second draw, tracing slows it down too much to time
+        tracemalloc.start()
+        await entries.draw(GIVEAWAY_ID, args.winners)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'draw:          {len(winners)} winners from {count} entries in {draw_elapsed * 1000:.1f} ms, '
+              f'peak {peak / 1024:.0f} KiB')
+
+        if args.fairness:
+            # Every entrant should win about equally often
+            small = GiveawayEntries(db)
+            await db.executemany(
+                'INSERT INTO giveaway_entries (giveaway_id, user_id) VALUES (?, ?)',
+                [(2, user_id) for user_id in range(20)]
+            )
+            wins = Counter()
+            for _ in range(args.fairness):
+                picked, _ = await small.draw(2, 3)
+                wins.update(picked)
+            expected = args.fairness * 3 / 20
+            spread = max(abs(n - expected) / expected for n in wins.values())
+            print(f'fairness:      {args.fairness} draws of 3 from 20, max deviation {spread:.1%}')
+
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Giveaway entry click-storm load test')
+    parser.add_argument('--clicks', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=600_000, help='distinct users clicking')
+    parser.add_argument('--winners', type=int, default=5)
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--fairness', type=int, default=0, help='repeat a small draw this many times')
+    parser.add_argument('--per-click', action='store_true', help='baseline with one INSERT per click')
+    parser.add_argument('--dir', default=None, help='directory for the temporary database')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
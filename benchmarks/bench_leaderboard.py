@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for utils.leaderboard.RankIndex
+
+Builds a rank index for one large guild and times XP updates, rank
+lookups, leaderboard pages and "users around me" queries against it.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.leaderboard import RankIndex
+
+
+def timed(label, count, func):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    p50 = samples[len(samples) // 2] * 1e6
+    p99 = samples[int(len(samples) * 0.99)] * 1e6
+    print(f'{label:<14} p50 {p50:8.1f}us   p99 {p99:8.1f}us')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--members', type=int, default=500_000)
+    parser.add_argument('--ops', type=int, default=20_000)
+    args = parser.parse_args()
+
+    user_ids = [random.getrandbits(60) for _ in range(args.members)]
+    index = RankIndex()
+
+    start = time.perf_counter()
+    index.bulk_load((user_id, random.randrange(1_000_000)) for user_id in user_ids)
+    print(f'bulk load      {args.members} members in {time.perf_counter() - start:.2f}s')
+
+    pages = args.members // 10
+    timed('update', args.ops, lambda: index.add(random.choice(user_ids), random.randrange(15, 26)))
+    timed('rank', args.ops, lambda: index.rank(random.choice(user_ids)))
+    timed('top page 1', args.ops, lambda: index.top(10, 1))
+    timed('random page', args.ops, lambda: index.top(10, random.randrange(1, pages)))
+    timed('around me', args.ops, lambda: index.around(random.choice(user_ids)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Load test for utils.outbound.OutboundScheduler against a fake API
+
+Starts a local HTTP server that enforces per-route and global token
+buckets like Discord does, answering 429 when a bucket is empty, then
+replays the same burst twice: every call fired at once (what the cogs
+did before, relying on 429 retries), and every call queued through the
+scheduler. The burst mixes suggestion posts with their two reactions,
+rapid edits of one poll message, and moderation actions sent in the
+middle of it. Reports 429s, API calls made, and how long moderation and
+cosmetic calls waited.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.outbound import (
+    COSMETIC, DEFAULT_LIMIT, MODERATION, NORMAL, ROUTE_LIMITS, OutboundScheduler, TokenBucket,
+)
+
+
+class RateLimited(Exception):
+    status = 429
+
+
+class FakeAPI:
+    """HTTP server answering POST /<kind>/<major id> with 200, or 429 when over the limit"""
+
+    def __init__(self, latency, global_limit):
+        self.latency = latency
+        self.global_limit = global_limit
+        self.buckets = {}
+        self.global_bucket = None
+        self.requests = 0
+        self.limited = 0
+
+    async def handle(self, reader, writer):
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        _, path, _ = request_line.decode().split(' ', 2)
+        kind, major = path.strip('/').split('/')
+
+        now = time.monotonic()
+        if self.global_bucket is None:
+            self.global_bucket = TokenBucket(*self.global_limit, now)
+        bucket = self.buckets.get((kind, major))
+        if bucket is None:
+            bucket = self.buckets[(kind, major)] = TokenBucket(*ROUTE_LIMITS.get(kind, DEFAULT_LIMIT), now)
+
+        self.requests += 1
+        if bucket.delay(now) or self.global_bucket.delay(now):
+            self.limited += 1
+            status = b'429 Too Many Requests'
+        else:
+            bucket.take()
+            self.global_bucket.take()
+            status = b'200 OK'
+        await asyncio.sleep(self.latency)
+        writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+        await writer.drain()
+        writer.close()
+
+
+async def request(port, kind, major):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'POST /{kind}/{major} HTTP/1.1\r\nHost: localhost\r\nContent-Length: 0\r\n\r\n'.encode())
+    await writer.drain()
+    status = await reader.readline()
+    writer.close()
+    if b' 429 ' in status:
+        raise RateLimited(f'429 on /{kind}/{major}')
+
+
+def build_burst(args):
+    """(priority, route, coalesce key, offset in seconds) for every call in the burst"""
+    calls = []
+    for i in range(args.suggestions):
+        channel = i % args.channels
+        calls.append((NORMAL, ('message', channel), None, 0.0))
+        calls.append((COSMETIC, ('reaction', channel), None, 0.0))
+        calls.append((COSMETIC, ('reaction', channel), None, 0.0))
+    for i in range(args.poll_edits):
+        calls.append((COSMETIC, ('message', 'poll'), ('edit', 'poll'), i * 0.01))
+    for i in range(args.bans):
+        calls.append((MODERATION, ('member', 'guild'), None, 0.2))
+    return calls
+
+
+async def run_naive(port, calls):
+    waits = {MODERATION: [], COSMETIC: []}
+
+    async def one(priority, route, offset):
+        await asyncio.sleep(offset)
+        start = time.perf_counter()
+        # Retry after the 429 like discord.py would
+        while True:
+            try:
+                await request(port, *route)
+                break
+            except RateLimited:
+                await asyncio.sleep(0.25)
+        if priority in waits:
+            waits[priority].append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(priority, route, offset) for priority, route, _, offset in calls))
+    return waits
+
+
+async def run_scheduled(port, calls, scheduler):
+    waits = {MODERATION: [], COSMETIC: []}
+
+    async def one(priority, route, coalesce, offset):
+        await asyncio.sleep(offset)
+        start = time.perf_counter()
+        try:
+            await scheduler.call(route, lambda: request(port, *route), priority, coalesce)
+        except RateLimited:
+            pass
+        if priority in waits:
+            waits[priority].append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(*call) for call in calls))
+    return waits
+
+
+def summarize(name, api, waits, elapsed):
+    print(f'{name}: {api.requests} API requests, {api.limited} answered 429, {elapsed:.2f}s')
+    for priority, label in ((MODERATION, 'moderation'), (COSMETIC, 'cosmetic')):
+        if waits[priority]:
+            print(f'  {label:<11} median {statistics.median(waits[priority]) * 1000:7.1f} ms, '
+                  f'max {max(waits[priority]) * 1000:7.1f} ms')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Outbound scheduler load test against a fake API')
+    parser.add_argument('--suggestions', type=int, default=40, help='suggestions posted, each with two reactions')
+    parser.add_argument('--channels', type=int, default=4)
+    parser.add_argument('--poll-edits', type=int, default=20, help='edits of one poll message')
+    parser.add_argument('--bans', type=int, default=3, help='moderation actions during the burst')
+    parser.add_argument('--latency', type=float, default=0.02, help='fake API response time')
+    args = parser.parse_args()
+    calls = build_burst(args)
+
+    for name in ('fire at once', 'scheduled'):
+        api = FakeAPI(args.latency, (50, 1.0))
+        server = await asyncio.start_server(api.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        start = time.perf_counter()
+        if name == 'scheduled':
+            scheduler = OutboundScheduler()
+            scheduler.start()
+            waits = await run_scheduled(port, calls, scheduler)
+            await scheduler.stop()
+        else:
+            waits = await run_naive(port, calls)
+        summarize(name, api, waits, time.perf_counter() - start)
+        server.close()
+        await server.wait_closed()
+
+    stats = scheduler.get_stats()
+    print(f'coalesced edits: {stats["coalesced"]}, max queue depth: {stats["max_depth"]}')
+    for priority, histogram in stats['wait_histogram'].items():
+        print(f'  {priority:<11} ' + ' '.join(f'{label}:{count}' for label, count in histogram.items() if count))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
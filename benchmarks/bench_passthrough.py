@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+CPU-per-stream benchmark for Opus passthrough vs. transcoding
+
+Generates local test tracks with ffmpeg (Opus in WebM, and AAC in M4A
+for comparison) and runs them through the same ffmpeg arguments
+discord.FFmpegOpusAudio uses, once with "-c:a copy" (passthrough) and
+once with libopus (transcode). Reports CPU seconds per second of audio
+and the resulting number of real-time streams per core.
+"""
+import argparse
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def child_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def make_track(path, codec, seconds):
+    """Render a test tone with some noise so the encoder has real work to do"""
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-f', 'lavfi', '-i', f'anoisesrc=amplitude=0.1:duration={seconds}',
+        '-filter_complex', 'amix=inputs=2', '-ac', '2', '-ar', '48000',
+        '-c:a', codec, '-b:a', '160k', str(path)
+    ], check=True)
+
+
+def run_stream(path, codec, bitrate=160):
+    """Same arguments FFmpegOpusAudio passes to ffmpeg, output discarded"""
+    subprocess.run([
+        'ffmpeg', '-loglevel', 'warning', '-i', str(path), '-vn',
+        '-map_metadata', '-1', '-f', 'opus', '-c:a', codec,
+        '-ar', '48000', '-ac', '2', '-b:a', f'{bitrate}k',
+        'pipe:1'
+    ], stdout=subprocess.DEVNULL, check=True)
+
+
+def measure(label, path, codec, seconds, runs):
+    cpu_start = child_cpu()
+    wall_start = time.perf_counter()
+    for _ in range(runs):
+        run_stream(path, codec)
+    cpu = child_cpu() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    per_audio_second = cpu / (seconds * runs)
+    streams = 1 / per_audio_second if per_audio_second else float('inf')
+    print(f'{label:<22} {per_audio_second * 1000:8.3f}ms CPU per audio second   '
+          f'~{streams:,.0f} real-time streams/core   ({wall:.2f}s wall)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=int, default=60, help='length of the test tracks')
+    parser.add_argument('--runs', type=int, default=5, help='streams per mode')
+    args = parser.parse_args()
+
+    if not shutil.which('ffmpeg'):
+        sys.exit('ffmpeg not found on PATH')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        opus_track = Path(tmp) / 'track.webm'
+        aac_track = Path(tmp) / 'track.m4a'
+        make_track(opus_track, 'libopus', args.seconds)
+        make_track(aac_track, 'aac', args.seconds)
+
+        measure('opus passthrough', opus_track, 'copy', args.seconds, args.runs)
+        measure('opus transcode', opus_track, 'libopus', args.seconds, args.runs)
+        measure('aac transcode', aac_track, 'libopus', args.seconds, args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Memory and operation benchmark for utils.music_queue
+
+Fills queues for many guilds with tracks drawn from a shared catalog and
+compares the memory held by deques of song dicts (the old layout) with
+MusicQueue/Track. Each layout is measured in its own subprocess so peak
+RSS isn't shared. Also times positional remove/move and rendering one
+/queue page against the old full-string rendering.
+"""
+import argparse
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.music_queue import MusicQueue, Track
+
+
+def catalog_entry(i):
+    """Fresh strings for one catalog song, as a yt-dlp lookup would return them"""
+    video_id = f'{i:011d}'
+    return {
+        'id': video_id,
+        'title': f'Artist {i % 5000} - Song number {i} (Official Audio)',
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+        'url': f'https://rr{i % 9}---sn-example.googlevideo.com/videoplayback?expire=1700000000&id={video_id}&itag=251',
+        'duration': 180 + i % 120,
+        'thumbnail': f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+    }
+
+
+def requester_name(user):
+    return f'listener_{user}'
+
+
+def fill(layout, guilds, tracks, catalog, users):
+    rng = random.Random(1)
+    queues = []
+    for _ in range(guilds):
+        if layout == 'dict':
+            queue = deque()
+        else:
+            queue = MusicQueue(max_size=tracks, per_user=tracks)
+        for _ in range(tracks):
+            # Every lookup result is its own set of string objects
+            info = catalog_entry(rng.randrange(catalog))
+            user = rng.randrange(users)
+            if layout == 'dict':
+                queue.append({
+                    'id': info['id'],
+                    'title': info['title'],
+                    'url': info['webpage_url'],
+                    'audio_url': info['url'],
+                    'duration': info['duration'],
+                    'codec': 'opus',
+                    'bitrate': 160,
+                    'requester': requester_name(user),
+                    'thumbnail': info['thumbnail'],
+                })
+            else:
+                queue.append(Track(
+                    video_id=info['id'],
+                    title=info['title'],
+                    url=info['webpage_url'],
+                    audio_url=info['url'],
+                    duration=info['duration'],
+                    codec='opus',
+                    bitrate=160,
+                    requester=requester_name(user),
+                    requester_id=user,
+                    thumbnail=info['thumbnail'],
+                ))
+        queues.append(queue)
+    return queues
+
+
+def measure_memory(args):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    queues = fill(args.layout, args.guilds, args.tracks, args.catalog, args.users)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    total = args.guilds * args.tracks
+    print(f'{args.layout:<8} {total:,} tracks  {peak / 1024:,.0f} MiB  '
+          f'{peak * 1024 / total:,.0f} B/track  filled in {elapsed:.1f}s')
+    return queues
+
+
+def time_ops(tracks, iterations=2000):
+    old = fill('dict', 1, tracks, tracks, 50)[0]
+    new = fill('compact', 1, tracks, tracks, 50)[0]
+    rng = random.Random(2)
+    positions = [(rng.randrange(tracks - 1), rng.randrange(tracks - 1)) for _ in range(iterations)]
+
+    start = time.perf_counter()
+    for src, dst in positions:
+        song = old[src]
+        del old[src]
+        old.insert(dst, song)
+    deque_move = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for src, dst in positions:
+        new.move(src, dst)
+    queue_move = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(50):
+        message = "**Music Queue:**\n"
+        for i, song in enumerate(old, 1):
+            message += f"{i}. {song['title']} (Requested by: {song['requester']})\n"
+        message = message[:1900]
+    full_render = (time.perf_counter() - start) / 50
+
+    start = time.perf_counter()
+    for _ in range(50):
+        page = rng.randrange(1, tracks // 10)
+        lines = [f"{position}. {song.title[:80]} (Requested by: {song.requester})"
+                 for position, song in new.page(page, 10)]
+        message = "\n".join(lines)
+    page_render = (time.perf_counter() - start) / 50
+
+    print(f'move in a {tracks:,}-track queue: deque {deque_move * 1e6:.1f}us, MusicQueue {queue_move * 1e6:.1f}us')
+    print(f'/queue render: full string {full_render * 1000:.2f}ms, one page {page_render * 1000:.3f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--tracks', type=int, default=10_000, help='tracks per guild queue')
+    parser.add_argument('--catalog', type=int, default=200_000, help='distinct songs tracks are drawn from')
+    parser.add_argument('--users', type=int, default=50, help='requesters per guild')
+    parser.add_argument('--layout', choices=('dict', 'compact'), help='measure one layout in this process')
+    args = parser.parse_args()
+
+    if args.layout:
+        measure_memory(args)
+        return
+
+    for layout in ('dict', 'compact'):
+        subprocess.run([sys.executable, __file__, '--layout', layout,
+                        '--guilds', str(args.guilds), '--tracks', str(args.tracks),
+                        '--catalog', str(args.catalog), '--users', str(args.users)])
+    time_ops(args.tracks)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark for utils.scheduler
+
+Compares one sleeping task per giveaway (the old approach) with a single
+TimerScheduler holding every timer: memory and time to load the pending
+giveaways at startup, latency of adding a timer with many already
+pending, and how long a burst of due timers takes to fire in batches.
+"""
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.scheduler import TimerScheduler
+
+
+async def noop(batch):
+    pass
+
+
+async def sleeper(delay):
+    await asyncio.sleep(delay)
+
+
+async def bench_tasks(pending):
+    tracemalloc.start()
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(sleeper(3600 + i)) for i in range(pending)]
+    await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return elapsed, memory
+
+
+async def bench_scheduler_load(pending):
+    scheduler = TimerScheduler(noop)
+    now = time.time()
+    tracemalloc.start()
+    start = time.perf_counter()
+    scheduler.bulk_add((i, now + 3600 + i) for i in range(pending))
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return scheduler, elapsed, memory
+
+
+def bench_add(scheduler, adds):
+    now = time.time()
+    base = len(scheduler) + 1
+    timings = []
+    for i in range(adds):
+        start = time.perf_counter()
+        scheduler.add(base + i, now + 60 + (i * 7919) % 7200)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+
+async def bench_fire(due, batch_size):
+    fired = []
+
+    async def fire(batch):
+        fired.extend(batch)
+
+    scheduler = TimerScheduler(fire, batch_size=batch_size)
+    now = time.time()
+    scheduler.bulk_add((i, now - 1) for i in range(due))
+    start = time.perf_counter()
+    scheduler.start()
+    while len(fired) < due:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+    return elapsed, scheduler.batches
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Benchmark the giveaway timer scheduler')
+    parser.add_argument('--pending', type=int, default=100000, help='giveaways waiting to end')
+    parser.add_argument('--adds', type=int, default=10000, help='timers added on top of the pending ones')
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    elapsed, memory = await bench_tasks(args.pending)
+    print(f'{args.pending} sleeping tasks:    {elapsed * 1000:8.1f} ms to create, {memory / 1024 / 1024:7.1f} MiB')
+
+    scheduler, elapsed, memory = await bench_scheduler_load(args.pending)
+    print(f'{args.pending} scheduler timers:  {elapsed * 1000:8.1f} ms to load,   {memory / 1024 / 1024:7.1f} MiB')
+
+    p50, p99 = bench_add(scheduler, args.adds)
+    print(f'add() with {len(scheduler) - args.adds} pending: p50 {p50 * 1e6:.2f} us, p99 {p99 * 1e6:.2f} us')
+
+    elapsed, batches = await bench_fire(args.pending, args.batch_size)
+    print(f'fire {args.pending} due timers: {elapsed * 1000:.1f} ms in {batches} batches '
+          f'({args.pending / elapsed:,.0f} timers/s)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Per-frame cost benchmark for the volume engines in utils.volume
+
+Times every available PCM gain stage on 20ms stereo 48kHz frames (what
+a voice client reads 50 times a second) and reports the cost per frame
+and as a share of the 20ms frame budget. When ffmpeg is on PATH it also
+measures the ffmpeg volume filter, i.e. decode + filter + libopus encode
+per frame, against a plain Opus remux.
+"""
+import argparse
+import math
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.volume import GAIN_STAGES
+
+FRAME_SAMPLES = 960
+FRAME_LENGTH_MS = 20
+
+
+def make_frames(count):
+    """Stereo 16-bit frames of a 440Hz tone"""
+    frames = []
+    for f in range(count):
+        samples = array('h')
+        for i in range(FRAME_SAMPLES):
+            value = int(20000 * math.sin(2 * math.pi * 440 * (f * FRAME_SAMPLES + i) / 48000))
+            samples.extend((value, value))
+        frames.append(samples.tobytes())
+    return frames
+
+
+def report(label, per_frame):
+    share = per_frame / (FRAME_LENGTH_MS / 1000) * 100
+    print(f'{label:<28} {per_frame * 1e6:9.1f}us/frame  {share:6.2f}% of a 20ms frame  '
+          f'~{1 / per_frame / 50:,.0f} streams/core')
+
+
+def bench_stages(frames, volume):
+    for name, gain in GAIN_STAGES.items():
+        count = len(frames) if name != 'array' else min(len(frames), 200)
+        start = time.perf_counter()
+        for frame in frames[:count]:
+            gain(frame, volume)
+        report(f'PCM gain ({name})', (time.perf_counter() - start) / count)
+
+
+def child_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def bench_ffmpeg(seconds, volume):
+    with tempfile.TemporaryDirectory() as tmp:
+        track = Path(tmp) / 'track.webm'
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi',
+            '-i', f'sine=frequency=440:duration={seconds}', '-ac', '2', '-ar', '48000',
+            '-c:a', 'libopus', '-b:a', '128k', str(track)
+        ], check=True)
+
+        modes = (
+            ('ffmpeg opus remux', ['-c:a', 'copy']),
+            ('ffmpeg volume filter', ['-af', f'volume={volume}', '-c:a', 'libopus', '-b:a', '128k']),
+            ('ffmpeg decode to PCM', ['-f', 's16le', '-ar', '48000', '-ac', '2']),
+        )
+        for label, args in modes:
+            output_format = [] if '-f' in args else ['-f', 'opus']
+            cpu = child_cpu()
+            subprocess.run(
+                ['ffmpeg', '-loglevel', 'error', '-i', str(track), '-vn', *output_format, *args, 'pipe:1'],
+                stdout=subprocess.DEVNULL, check=True
+            )
+            report(label, (child_cpu() - cpu) / (seconds * 1000 / FRAME_LENGTH_MS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--volume', type=float, default=0.6)
+    parser.add_argument('--seconds', type=int, default=60, help='length of the ffmpeg test track')
+    args = parser.parse_args()
+
+    frames = make_frames(min(args.frames, 500))
+    frames = (frames * (args.frames // len(frames) + 1))[:args.frames]
+    bench_stages(frames, args.volume)
+
+    if shutil.which('ffmpeg'):
+        bench_ffmpeg(args.seconds, args.volume)
+    else:
+        print('ffmpeg not found on PATH, skipping the filter measurements')
+
+
+if __name__ == '__main__':
+    main()
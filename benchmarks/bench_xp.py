@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Message-storm benchmark for utils.xp.XPEngine
+
+Feeds synthetic messages from many users across many guilds into the XP
+engine as fast as possible, flushing to a file-backed database on a
+timer, and reports message throughput, flush cost and memory use.
+"""
+import argparse
+import asyncio
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.database import Database
+from utils.xp import XPEngine
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db = Database(Path(tmp) / 'bench.db')
+        engine = XPEngine(
+            db,
+            cooldown=args.cooldown,
+            flush_interval=args.flush_interval,
+            max_slots=args.max_slots
+        )
+
+        # Pre-generate message authors so the loop only measures the engine
+        authors = [
+            (random.randrange(args.guilds), random.randrange(args.users))
+            for _ in range(min(args.messages, 1_000_000))
+        ]
+
+        engine.start()
+        start = time.perf_counter()
+        record = engine.record
+        for i in range(args.messages):
+            guild_id, user_id = authors[i % len(authors)]
+            record(guild_id, user_id)
+            if i % 5000 == 0:
+                # Yield like the gateway would between events
+                await asyncio.sleep(0)
+        record_elapsed = time.perf_counter() - start
+
+        flush_start = time.perf_counter()
+        await engine.stop()
+        flush_elapsed = time.perf_counter() - flush_start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        stats = engine.get_stats()
+        row = await db.fetchone('SELECT COUNT(*) AS users, SUM(xp) AS xp FROM users')
+        await db.close()
+
+    print(f'messages:      {args.messages} ({args.messages / record_elapsed:,.0f}/s)')
+    print(f'tracked users: {stats["tracked_users"]} (max {args.max_slots})')
+    print(f'flushes:       {stats["flushes"]}, final flush {flush_elapsed * 1000:.1f}ms')
+    print(f'dropped:       {stats["dropped"]}')
+    print(f'xp awarded:    {stats["awarded_xp"]} (db has {row["xp"]} for {row["users"]} users)')
+    print(f'peak RSS:      {peak / 1024:.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--guilds', type=int, default=100)
+    parser.add_argument('--users', type=int, default=1_000, help='distinct users per guild')
+    parser.add_argument('--cooldown', type=float, default=60.0)
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--max-slots', type=int, default=200_000)
+    parser.add_argument('--dir', default=None, help='directory for the database file')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,131 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from discord.ui import Button, View
 import asyncio
-from datetime import datetime, timedelta
-import random
+from datetime import datetime, timedelta, timezone
+import logging
+from utils.components import detached
+from utils.giveaways import GiveawayEntries
+from utils.leaderboard import Leaderboards
+from utils.outbound import COSMETIC
+from utils.polls import PollEngine
+from utils.scheduler import TimerScheduler
+from utils.xp import XPEngine, XP_PER_LEVEL, level_for_xp
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_PAGE_SIZE = 10
+
+def parse_timestamp(value):
+    """Aware datetime for a naive UTC timestamp column"""
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+def poll_embed(poll):
+    """Render a poll with its current results"""
+    embed = discord.Embed(
+        title=f"📊 Poll: {poll.question}",
+        color=discord.Color.purple(),
+        timestamp=parse_timestamp(poll.created_at)
+    )
+    
+    total = poll.total
+    for i, option in enumerate(poll.options):
+        votes = poll.tallies[i]
+        share = votes / total if total else 0
+        bar = "█" * round(share * 10) + "░" * (10 - round(share * 10))
+        embed.add_field(name=f"Option {i + 1}", value=f"{option}\n{bar} {votes} ({share:.0%})", inline=False)
+    
+    embed.set_footer(text=f"Poll created by {poll.author} • {total} votes")
+    return embed
+
+def parse_ends_at(value):
+    """Unix time for a giveaway's ends_at column, older rows are naive UTC"""
+    ends_at = datetime.fromisoformat(value)
+    if ends_at.tzinfo is None:
+        ends_at = ends_at.replace(tzinfo=timezone.utc)
+    return ends_at.timestamp()
 
 class PollView(View):
+    """Vote buttons, clicks are handled by Community.on_poll_vote"""
     def __init__(self, poll_id, options):
         super().__init__(timeout=None)
-        self.poll_id = poll_id
         for i, option in enumerate(options):
-            button = Button(label=option[:20], style=discord.ButtonStyle.secondary, custom_id=f"poll_{poll_id}_{i}")
-            button.callback = self.vote_callback
-            self.add_item(button)
-    
-    async def vote_callback(self, interaction: discord.Interaction):
-        await interaction.response.send_message("Thanks for voting!", ephemeral=True)
+            self.add_item(Button(label=option[:20], style=discord.ButtonStyle.secondary, custom_id=f"poll_{poll_id}_{i}"))
 
 class GiveawayView(View):
+    """Enter button, clicks are handled by Community.on_giveaway_enter"""
     def __init__(self, giveaway_id):
         super().__init__(timeout=None)
-        self.giveaway_id = giveaway_id
-        button = Button(label="Enter Giveaway", style=discord.ButtonStyle.success, custom_id=f"giveaway_{giveaway_id}")
-        button.callback = self.enter_callback
-        self.add_item(button)
-    
-    async def enter_callback(self, interaction: discord.Interaction):
-        await interaction.response.send_message("You've entered the giveaway!", ephemeral=True)
+        self.add_item(Button(label="Enter Giveaway", style=discord.ButtonStyle.success, custom_id=f"giveaway_{giveaway_id}"))
 
 class Community(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_polls = {}
-        self.active_giveaways = {}
+        self.xp = XPEngine(bot.db)
+        self.leaderboards = Leaderboards(bot.db)
+        self.xp.add_listener(self.leaderboards.apply)
+        
+        # One task ends every giveaway when it is due
+        self.giveaways = TimerScheduler(self.end_giveaways)
+        self.giveaway_load_task = None
+        self.giveaway_entries = GiveawayEntries(bot.db)
+        
+        # Poll results are edited into the message at most every 2 seconds
+        self.polls = PollEngine(bot.db, render=self.render_poll)
+    
+    async def cog_load(self):
+        self.xp.start()
+        self.giveaway_entries.start()
+        self.polls.start()
+        self.giveaways.start()
+        self.giveaway_load_task = asyncio.create_task(self.load_giveaways())
+        
+        # Buttons of every poll and giveaway, including ones sent before a restart
+        self.bot.components.register('poll', self.on_poll_vote)
+        self.bot.components.register('giveaway', self.on_giveaway_enter)
+    
+    async def cog_unload(self):
+        self.bot.components.unregister('poll')
+        self.bot.components.unregister('giveaway')
+        # Write out XP still held in memory
+        await self.xp.stop()
+        if self.giveaway_load_task:
+            self.giveaway_load_task.cancel()
+        await self.giveaways.stop()
+        await self.giveaway_entries.stop()
+        await self.polls.stop()
+    
+    async def interaction_check(self, interaction: discord.Interaction):
+        return await self.bot.check_cooldown(interaction)
+    
+    async def load_giveaways(self, batch_size=5000):
+        """Schedule every giveaway that hasn't ended, including ones that came due while offline"""
+        last_id = 0
+        timers = []
+        try:
+            while True:
+                rows = await self.bot.db.fetchall('''
+                    SELECT giveaway_id, ends_at FROM giveaways
+                    WHERE ended = 0 AND giveaway_id > ?
+                    ORDER BY giveaway_id
+                    LIMIT ?
+                ''', (last_id, batch_size))
+                timers.extend((row['giveaway_id'], parse_ends_at(row['ends_at'])) for row in rows)
+                if len(rows) < batch_size:
+                    break
+                last_id = rows[-1]['giveaway_id']
+        except Exception as e:
+            logger.error(f"Error loading giveaways: {e}")
+        self.giveaways.bulk_add(timers)
+    
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """Award XP for messages"""
+        if message.author.bot or not message.guild:
+            return
+        
+        self.xp.record(message.guild.id, message.author.id)
     
     @app_commands.command(name="poll", description="Create a poll")
     @app_commands.describe(question="Poll question", option1="Option 1", option2="Option 2", 
@@ -46,29 +139,34 @@ class Community(commands.Cog):
         if option5: options.append(option5)
         
         # Store poll in database
-        options_json = json.dumps(options)
-        
-        # Create embed
-        embed = discord.Embed(
-            title=f"📊 Poll: {question}",
-            color=discord.Color.purple(),
-            timestamp=datetime.utcnow()
-        )
-        
-        for i, option in enumerate(options, 1):
-            embed.add_field(name=f"Option {i}", value=option, inline=False)
-        
-        embed.set_footer(text=f"Poll created by {interaction.user}")
+        poll = await self.polls.create(interaction.guild.id, interaction.channel.id, question, options, str(interaction.user))
         
         # Send poll with buttons
-        view = PollView(f"{interaction.message.id}", options)
-        await interaction.response.send_message(embed=embed, view=view)
+        view = detached(PollView(poll.poll_id, options))
+        await interaction.response.send_message(embed=poll_embed(poll), view=view)
+        message = await interaction.original_response()
+        await self.polls.set_message(poll, message.id)
+    
+    async def render_poll(self, poll):
+        """Edit a poll's message with its current results"""
+        channel = self.bot.get_channel(poll.channel_id)
+        if channel and poll.message_id:
+            message = channel.get_partial_message(poll.message_id)
+            # A newer render replaces one that is still waiting for the rate limit
+            await self.bot.outbound.call(
+                ('message', channel.id), lambda: message.edit(embed=poll_embed(poll)), COSMETIC,
+                coalesce=('edit', poll.message_id)
+            )
     
     @app_commands.command(name="giveaway", description="Start a giveaway")
     @app_commands.describe(prize="Giveaway prize", duration="Duration (e.g., 1h, 1d, 7d)", winners="Number of winners")
     @app_commands.default_permissions(manage_guild=True)
     async def giveaway(self, interaction: discord.Interaction, prize: str, duration: str, winners: int = 1):
         """Start a giveaway"""
+        if winners < 1:
+            await interaction.response.send_message("A giveaway needs at least 1 winner!", ephemeral=True)
+            return
+        
         # Parse duration
         try:
             if duration.endswith('m'):
@@ -80,7 +178,7 @@ class Community(commands.Cog):
             else:
                 seconds = int(duration)
             
-            ends_at = datetime.utcnow() + timedelta(seconds=seconds)
+            ends_at = datetime.now(timezone.utc) + timedelta(seconds=seconds)
             
             # Create embed
             embed = discord.Embed(
@@ -91,44 +189,90 @@ class Community(commands.Cog):
             )
             embed.set_footer(text=f"Hosted by {interaction.user}")
             
-            # Store in database
-            await self.bot.db.execute('''
+            # Store in database, the row id identifies the giveaway's button
+            giveaway_id = await self.bot.db.execute('''
                 INSERT INTO giveaways (guild_id, channel_id, prize, winners, ends_at)
                 VALUES (?, ?, ?, ?, ?)
             ''', (interaction.guild.id, interaction.channel.id, prize, winners, ends_at.isoformat()))
             
-            # Send giveaway
-            view = GiveawayView(f"{interaction.message.id}")
-            message = await interaction.response.send_message(embed=embed, view=view)
+            # Schedule ending, this also opens the giveaway for entries
+            self.giveaways.add(giveaway_id, ends_at.timestamp())
             
-            # Schedule ending
-            asyncio.create_task(self.end_giveaway(interaction.guild.id, interaction.channel.id, message.id, ends_at, winners))
+            # Send giveaway
+            view = detached(GiveawayView(giveaway_id))
+            await interaction.response.send_message(embed=embed, view=view)
+            message = await interaction.original_response()
+            await self.bot.db.execute(
+                'UPDATE giveaways SET message_id = ? WHERE giveaway_id = ?', (message.id, giveaway_id)
+            )
             
         except ValueError:
             await interaction.response.send_message("Invalid duration! Use: 1h, 1d, 7d")
     
-    async def end_giveaway(self, guild_id, channel_id, message_id, ends_at, winners):
+    async def on_poll_vote(self, interaction: discord.Interaction, argument: str):
+        """Vote button on a poll, the custom_id is poll_<poll id>_<option>"""
+        poll_id, option = map(int, argument.split('_'))
+        poll, previous = await self.polls.vote(poll_id, interaction.user.id, option)
+        if poll is None:
+            await interaction.response.send_message("This poll no longer exists!", ephemeral=True)
+        elif previous == option:
+            await interaction.response.send_message(f"You already voted for **{poll.options[option]}**!", ephemeral=True)
+        elif previous is not None:
+            await interaction.response.send_message(f"Your vote changed to **{poll.options[option]}**!", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"You voted for **{poll.options[option]}**!", ephemeral=True)
+    
+    async def on_giveaway_enter(self, interaction: discord.Interaction, argument: str):
+        """Enter button on a giveaway, the custom_id is giveaway_<giveaway id>"""
+        giveaway_id = int(argument)
+        # Pending giveaways are known once the startup load has finished
+        if self.giveaway_load_task and not self.giveaway_load_task.done():
+            await asyncio.shield(self.giveaway_load_task)
+        
+        if giveaway_id not in self.giveaways:
+            await interaction.response.send_message("This giveaway has ended!", ephemeral=True)
+        elif self.giveaway_entries.add(giveaway_id, interaction.user.id):
+            await interaction.response.send_message("You've entered the giveaway!", ephemeral=True)
+        else:
+            await interaction.response.send_message("You've already entered this giveaway!", ephemeral=True)
+    
+    async def end_giveaways(self, giveaway_ids):
+        """End a batch of giveaways that are due"""
+        placeholders = ', '.join('?' * len(giveaway_ids))
+        rows = await self.bot.db.fetchall(f'''
+            SELECT giveaway_id, channel_id, message_id, winners FROM giveaways
+            WHERE ended = 0 AND giveaway_id IN ({placeholders})
+        ''', giveaway_ids)
+        
+        for row in rows:
+            try:
+                await self.end_giveaway(row['giveaway_id'], row['channel_id'], row['message_id'], row['winners'])
+            except Exception as e:
+                # The timer is gone either way, retrying at every restart would fail the same way
+                logger.error(f"Error ending giveaway {row['giveaway_id']}: {e}", exc_info=e)
+            await self.bot.db.execute('UPDATE giveaways SET ended = 1 WHERE giveaway_id = ?', (row['giveaway_id'],))
+    
+    async def end_giveaway(self, giveaway_id, channel_id, message_id, winners):
         """End a giveaway"""
-        await asyncio.sleep((ends_at - datetime.utcnow()).total_seconds())
+        # Draw winners from the stored entries
+        winners_list, entry_count = await self.giveaway_entries.draw(giveaway_id, winners)
         
-        # Get entries from database
-        entries = []  # This would come from your database
+        if winners_list:
+            result = f"**🎊 Winners:** {', '.join(f'<@{w}>' for w in winners_list)}\n**Entries:** {entry_count}"
+        else:
+            result = "**No valid entries.**"
         
-        if entries:
-            winners_list = random.sample(entries, min(winners, len(entries)))
-            winners_mentions = ", ".join(f"<@{w}>" for w in winners_list)
-            
-            # Update message
-            channel = self.bot.get_channel(channel_id)
-            if channel:
-                try:
-                    message = await channel.fetch_message(message_id)
-                    embed = message.embeds[0]
-                    embed.description += f"\n\n**🎊 Winners:** {winners_mentions}"
-                    embed.color = discord.Color.green()
-                    await message.edit(embed=embed, view=None)
-                except:
-                    pass
+        # Update message
+        channel = self.bot.get_channel(channel_id)
+        if channel and message_id:
+            try:
+                message = await channel.fetch_message(message_id)
+                embed = message.embeds[0]
+                embed.description += f"\n\n{result}"
+                embed.color = discord.Color.green()
+                await self.bot.outbound.call(('message', channel_id), lambda: message.edit(embed=embed, view=None))
+            except (discord.HTTPException, IndexError):
+                pass
     
     @app_commands.command(name="suggest", description="Submit a suggestion")
     @app_commands.describe(suggestion="Your suggestion")
@@ -149,11 +293,15 @@ class Community(commands.Cog):
                 )
                 embed.set_footer(text=f"Suggested by {interaction.user}", icon_url=interaction.user.avatar.url)
                 
-                message = await channel.send(embed=embed)
-                await message.add_reaction("✅")
-                await message.add_reaction("❌")
+                # The send can wait in the channel's queue longer than the 3 second response window
+                await interaction.response.defer(ephemeral=True)
                 
-                await interaction.response.send_message("✅ Suggestion submitted!", ephemeral=True)
+                message = await self.bot.outbound.call(('message', channel.id), lambda: channel.send(embed=embed))
+                # Reactions can trail behind the reply
+                self.bot.outbound.post(('reaction', channel.id), lambda: message.add_reaction("✅"))
+                self.bot.outbound.post(('reaction', channel.id), lambda: message.add_reaction("❌"))
+                
+                await interaction.followup.send("✅ Suggestion submitted!", ephemeral=True)
                 return
         
         await interaction.response.send_message("✅ Suggestion received! (No suggestion channel configured)", ephemeral=True)
@@ -163,16 +311,11 @@ class Community(commands.Cog):
         """Check rank"""
         target = user or interaction.user
         
-        # Get user data from database
-        row = await self.bot.db.fetchone('''
-            SELECT xp, level FROM users 
-            WHERE guild_id = ? AND user_id = ?
-        ''', (interaction.guild.id, target.id))
-        
-        if row:
-            xp, level = row['xp'], row['level']
-        else:
-            xp, level = 0, 1
+        # Look up the member in the guild's rank index
+        index = await self.leaderboards.get(interaction.guild.id)
+        xp = index.get_xp(target.id) or 0
+        level = level_for_xp(xp)
+        position = index.rank(target.id)
         
         # Create embed
         embed = discord.Embed(
@@ -181,41 +324,60 @@ class Community(commands.Cog):
         )
         embed.add_field(name="Level", value=str(level), inline=True)
         embed.add_field(name="XP", value=str(xp), inline=True)
-        embed.add_field(name="Next Level", value=f"{1000 - (xp % 1000)} XP", inline=True)
+        embed.add_field(name="Next Level", value=f"{XP_PER_LEVEL - (xp % XP_PER_LEVEL)} XP", inline=True)
+        embed.add_field(name="Rank", value=f"#{position} of {len(index)}" if position else "Unranked", inline=True)
+        
+        # Members just above and below
+        nearby = index.around(target.id)
+        if len(nearby) > 1:
+            embed.add_field(name="Nearby", value=self.format_rows(interaction.guild, nearby, highlight=target.id), inline=False)
+        
         embed.set_thumbnail(url=target.avatar.url)
         
         await interaction.response.send_message(embed=embed)
     
     @app_commands.command(name="leaderboard", description="Server XP leaderboard")
-    async def leaderboard(self, interaction: discord.Interaction):
+    @app_commands.describe(page="Leaderboard page")
+    async def leaderboard(self, interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1):
         """Show leaderboard"""
-        # Get top 10 users
-        rows = await self.bot.db.fetchall('''
-            SELECT user_id, xp, level FROM users 
-            WHERE guild_id = ? 
-            ORDER BY xp DESC 
-            LIMIT 10
-        ''', (interaction.guild.id,))
-        
-        if not rows:
+        index = await self.leaderboards.get(interaction.guild.id)
+        
+        if not len(index):
             await interaction.response.send_message("No users on leaderboard yet!")
             return
         
+        pages = (len(index) + LEADERBOARD_PAGE_SIZE - 1) // LEADERBOARD_PAGE_SIZE
+        page = min(page, pages)
+        rows = index.top(LEADERBOARD_PAGE_SIZE, page)
+        
         embed = discord.Embed(
             title="🏆 Server Leaderboard",
             color=discord.Color.gold()
         )
         
-        for i, row in enumerate(rows, 1):
-            user = interaction.guild.get_member(row['user_id'])
-            username = user.name if user else f"User {row['user_id']}"
+        for position, user_id, xp in rows:
+            user = interaction.guild.get_member(user_id)
+            username = user.name if user else f"User {user_id}"
             embed.add_field(
-                name=f"{i}. {username}",
-                value=f"Level {row['level']} • {row['xp']} XP",
+                name=f"{position}. {username}",
+                value=f"Level {level_for_xp(xp)} • {xp} XP",
                 inline=False
             )
         
+        embed.set_footer(text=f"Page {page}/{pages}")
+        
         await interaction.response.send_message(embed=embed)
+    
+    @staticmethod
+    def format_rows(guild, rows, highlight=None):
+        """Format (rank, user_id, xp) rows as leaderboard lines"""
+        lines = []
+        for position, user_id, xp in rows:
+            user = guild.get_member(user_id)
+            username = user.name if user else f"User {user_id}"
+            line = f"{position}. {username} • {xp} XP"
+            lines.append(f"**{line}**" if user_id == highlight else line)
+        return "\n".join(lines)
 
 async def setup(bot):
     await bot.add_cog(Community(bot))
@@ -4,6 +4,7 @@ from discord import app_commands
 import asyncio
 from datetime import datetime, timedelta
 import time
+from utils.outbound import MODERATION
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
@@ -19,8 +20,13 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("You cannot ban someone with equal or higher role!", ephemeral=True)
             return
         
+        # The ban can wait in the member queue longer than the 3 second response window
+        await interaction.response.defer()
+        
         try:
-            await user.ban(reason=f"By {interaction.user}: {reason}")
+            await self.bot.outbound.call(
+                ('member', interaction.guild.id), lambda: user.ban(reason=f"By {interaction.user}: {reason}"), MODERATION
+            )
             
             # Log to database
             await self.bot.db.add_moderation_log(
@@ -32,9 +38,9 @@ class Moderation(commands.Cog):
                 None
             )
             
-            await interaction.response.send_message(f"✅ {user.mention} has been banned. Reason: {reason}")
+            await interaction.followup.send(f"✅ {user.mention} has been banned. Reason: {reason}")
         except Exception as e:
-            await interaction.response.send_message(f"Failed to ban user: {e}")
+            await interaction.followup.send(f"Failed to ban user: {e}")
     
     @app_commands.command(name="kick", description="Kick a user from the server")
     @app_commands.describe(user="User to kick", reason="Reason for kick")
@@ -45,8 +51,12 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("You cannot kick someone with equal or higher role!", ephemeral=True)
             return
         
+        await interaction.response.defer()
+        
         try:
-            await user.kick(reason=f"By {interaction.user}: {reason}")
+            await self.bot.outbound.call(
+                ('member', interaction.guild.id), lambda: user.kick(reason=f"By {interaction.user}: {reason}"), MODERATION
+            )
             
             # Log to database
             await self.bot.db.add_moderation_log(
@@ -58,9 +68,9 @@ class Moderation(commands.Cog):
                 None
             )
             
-            await interaction.response.send_message(f"👢 {user.mention} has been kicked. Reason: {reason}")
+            await interaction.followup.send(f"👢 {user.mention} has been kicked. Reason: {reason}")
         except Exception as e:
-            await interaction.response.send_message(f"Failed to kick user: {e}")
+            await interaction.followup.send(f"Failed to kick user: {e}")
     
     @app_commands.command(name="timeout", description="Timeout a user")
     @app_commands.describe(user="User to timeout", duration="Duration (e.g., 60s, 5m, 1h, 1d)", reason="Reason for timeout")
@@ -83,14 +93,24 @@ class Moderation(commands.Cog):
                 seconds = int(duration[:-1]) * 86400
             else:
                 seconds = int(duration)
-            
-            if seconds > 2419200:  # 28 days max
-                await interaction.response.send_message("Duration cannot exceed 28 days!")
-                return
-                
+        except ValueError:
+            await interaction.response.send_message("Invalid duration format! Use: 60s, 5m, 1h, 1d")
+            return
+        
+        if seconds > 2419200:  # 28 days max
+            await interaction.response.send_message("Duration cannot exceed 28 days!")
+            return
+        
+        await interaction.response.defer()
+        
+        try:
             timeout_until = datetime.utcnow() + timedelta(seconds=seconds)
             
-            await user.timeout(timeout_until, reason=f"By {interaction.user}: {reason}")
+            await self.bot.outbound.call(
+                ('member', interaction.guild.id),
+                lambda: user.timeout(timeout_until, reason=f"By {interaction.user}: {reason}"),
+                MODERATION
+            )
             
             # Log to database
             await self.bot.db.add_moderation_log(
@@ -102,14 +122,12 @@ class Moderation(commands.Cog):
                 duration
             )
             
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 f"⏰ {user.mention} has been timed out for {duration}. Reason: {reason}"
             )
             
-        except ValueError:
-            await interaction.response.send_message("Invalid duration format! Use: 60s, 5m, 1h, 1d")
         except Exception as e:
-            await interaction.response.send_message(f"Failed to timeout user: {e}")
+            await interaction.followup.send(f"Failed to timeout user: {e}")
     
     @app_commands.command(name="warn", description="Warn a user")
     @app_commands.describe(user="User to warn", reason="Reason for warning")
@@ -120,19 +138,13 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("You cannot warn someone with equal or higher role!", ephemeral=True)
             return
         
-        # Add warning to database
-        await self.bot.db.execute('''
-            INSERT INTO warnings (guild_id, user_id, moderator_id, reason)
-            VALUES (?, ?, ?, ?)
-        ''', (interaction.guild.id, user.id, interaction.user.id, reason))
-        
-        # Count warnings
-        rows = await self.bot.db.fetchall('''
-            SELECT COUNT(*) as count FROM warnings 
-            WHERE guild_id = ? AND user_id = ? AND expired = 0
-        ''', (interaction.guild.id, user.id))
-        
-        warning_count = rows[0]['count'] if rows else 0
+        # Add warning and count active warnings in one write
+        warning_count = await self.bot.db.add_warning(
+            interaction.guild.id,
+            user.id,
+            interaction.user.id,
+            reason
+        )
         
         await interaction.response.send_message(
             f"⚠️ {user.mention} has been warned. Reason: {reason}\n"
@@ -151,7 +163,9 @@ class Moderation(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         try:
-            deleted = await interaction.channel.purge(limit=amount)
+            deleted = await self.bot.outbound.call(
+                ('purge', interaction.channel.id), lambda: interaction.channel.purge(limit=amount), MODERATION
+            )
             await interaction.followup.send(f"🧹 Deleted {len(deleted)} messages", ephemeral=True)
         except Exception as e:
             await interaction.followup.send(f"Failed to clear messages: {e}", ephemeral=True)
@@ -179,8 +193,16 @@ class Moderation(commands.Cog):
                 seconds = int(duration[:-1]) * 3600
             else:
                 seconds = int(duration)
-            
-            await user.edit(mute=True, reason=f"By {interaction.user}: {reason}")
+        except ValueError:
+            await interaction.response.send_message("Invalid duration format! Use: 60s, 5m, 1h")
+            return
+        
+        await interaction.response.defer()
+        
+        try:
+            await self.bot.outbound.call(
+                ('member', interaction.guild.id), lambda: user.edit(mute=True, reason=f"By {interaction.user}: {reason}"), MODERATION
+            )
             
             # Log to database
             await self.bot.db.add_moderation_log(
@@ -192,19 +214,19 @@ class Moderation(commands.Cog):
                 duration
             )
             
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 f"🔇 {user.mention} has been voice muted for {duration}. Reason: {reason}"
             )
             
             # Auto-unmute after duration
             await asyncio.sleep(seconds)
             if user.voice and user.voice.mute:
-                await user.edit(mute=False, reason="Auto-unmute after timeout")
+                await self.bot.outbound.call(
+                    ('member', interaction.guild.id), lambda: user.edit(mute=False, reason="Auto-unmute after timeout"), MODERATION
+                )
                 
-        except ValueError:
-            await interaction.response.send_message("Invalid duration format! Use: 60s, 5m, 1h")
         except Exception as e:
-            await interaction.response.send_message(f"Failed to mute user: {e}")
+            await interaction.followup.send(f"Failed to mute user: {e}")
 
 async def setup(bot):
     await bot.add_cog(Moderation(bot))
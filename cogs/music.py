@@ -1,13 +1,33 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import yt_dlp
 import asyncio
-from collections import deque
-import json
+from datetime import timedelta
+import logging
+import os
+import time
+from utils.audio import stream_bitrate, stream_codec
+from utils.extractor import ExtractionPool, ExtractionError, is_playlist_url, playlist_has_more
+from utils.idle import IdleReaper, session_idle_reason
+from utils.music_queue import MusicQueue, QueueFull, Track
+from utils.playback import PlaybackController
+from utils.prefetch import Prefetcher
+from utils.queue_snapshots import QueueSnapshots
+from utils.track_cache import TrackCache, stream_is_fresh
 
-# Suppress yt-dlp warnings
-yt_dlp.utils.bug_reports_message = lambda: ''
+logger = logging.getLogger(__name__)
+
+# Interaction tokens stop accepting followups after 15 minutes
+INTERACTION_LIFETIME = timedelta(minutes=15)
+
+QUEUE_PAGE_SIZE = 10
+
+# Playlists are listed in pages: a short first one so playback starts quickly, then bigger ones
+PLAYLIST_FIRST_PAGE = 10
+PLAYLIST_PAGE_SIZE = 100
+
+# Songs that fail to start in a row before play_next stops trying
+MAX_START_ATTEMPTS = 5
 
 class Music(commands.Cog):
     def __init__(self, bot):
@@ -15,10 +35,13 @@ class Music(commands.Cog):
         self.queues = {}
         self.now_playing = {}
         self.voice_clients = {}
+        # Guilds where play_next is resolving the next song and hasn't started it yet
+        self.starting = set()
         
         # YT-DLP options
         self.ydl_opts = {
-            'format': 'bestaudio/best',
+            # Prefer Opus so it can be sent to Discord without re-encoding
+            'format': 'bestaudio[acodec=opus]/bestaudio/best',
             'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
             'restrictfilenames': True,
             'noplaylist': True,
@@ -32,10 +55,91 @@ class Music(commands.Cog):
             'extract_flat': False,
         }
         
+        # yt-dlp runs in worker processes, it is imported there on first use
+        self.extractor = ExtractionPool(self.ydl_opts)
+        
+        # Resolved tracks shared by all guilds, optionally kept across restarts
+        self.track_cache = TrackCache(path=os.getenv('MUSIC_CACHE_PATH'))
+        
+        # Resolves and probes upcoming songs so transitions don't wait on ffprobe
+        self.prefetcher = Prefetcher(self.prepare_song)
+        
         self.ffmpeg_options = {
             'options': '-vn',
             'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5'
         }
+        
+        # Starts and controls audio on the voice clients
+        self.playback = PlaybackController(
+            self.voice_clients,
+            self.ffmpeg_options,
+            volume_mode=os.getenv('MUSIC_VOLUME_MODE', 'auto')
+        )
+        
+        # Queue limits per guild and per requester
+        self.queue_max = int(os.getenv('MUSIC_QUEUE_MAX', 1000))
+        self.queue_per_user = int(os.getenv('MUSIC_QUEUE_PER_USER', 100))
+        
+        # Background playlist loads per guild
+        self.playlist_tasks = {}
+        
+        # Streams remuxed as-is vs. transcoded to Opus
+        self.stream_modes = {'passthrough': 0, 'transcode': 0}
+        
+        # Leaves voice channels nobody is listening in, or that stopped playing
+        self.reaper = IdleReaper(
+            lambda: list(self.voice_clients),
+            self.idle_reason,
+            self.release_guild,
+            timeouts={
+                'empty': int(os.getenv('MUSIC_EMPTY_TIMEOUT', 60)),
+                'idle': int(os.getenv('MUSIC_IDLE_TIMEOUT', 300)),
+            }
+        )
+    
+        # Queues survive restarts, each guild's is restored on its first music command
+        self.snapshots = QueueSnapshots(
+            bot.db,
+            self.snapshot_state,
+            interval=int(os.getenv('MUSIC_SNAPSHOT_INTERVAL', 10))
+        )
+    
+    async def cog_load(self):
+        self.reaper.start()
+        self.snapshots.start()
+    
+    async def interaction_check(self, interaction: discord.Interaction):
+        """Rate limit music commands and restore a guild's saved queue before its first one runs"""
+        await self.bot.check_cooldown(interaction)
+        if interaction.guild is not None and interaction.guild.id not in self.queues:
+            await self.restore_queue(interaction.guild.id)
+        return True
+    
+    async def restore_queue(self, guild_id):
+        """Bring back the queue a guild had before a restart"""
+        try:
+            restored = await self.snapshots.restore(guild_id, self.queue_max, self.queue_per_user)
+        except Exception as e:
+            logger.error(f"Error restoring music queue for guild {guild_id}: {e}")
+            return
+        if restored is None or guild_id in self.queues:
+            return
+        
+        queue, volume = restored
+        self.queues[guild_id] = queue
+        if volume != 1.0:
+            self.playback.set_volume(guild_id, volume)
+    
+    def snapshot_state(self, guild_id):
+        """Songs to save for a guild, the playing one first, and its volume"""
+        tracks = []
+        if guild_id in self.now_playing:
+            tracks.append(self.now_playing[guild_id])
+        if guild_id in self.queues:
+            tracks.extend(self.queues[guild_id])
+        if not tracks:
+            return None
+        return tracks, self.playback.volumes.get(guild_id, 1.0)
     
     @app_commands.command(name="play", description="Play a song from YouTube")
     @app_commands.describe(query="Song name or YouTube URL")
@@ -60,73 +164,255 @@ class Music(commands.Cog):
         else:
             vc = self.voice_clients[interaction.guild.id]
         
+        if interaction.guild.id not in self.queues:
+            self.queues[interaction.guild.id] = MusicQueue(self.queue_max, self.queue_per_user)
+        queue = self.queues[interaction.guild.id]
+        
+        if is_playlist_url(query):
+            await self.queue_playlist(interaction, queue, query)
+            return
+        
         # Get song info
         try:
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                info = ydl.extract_info(query, download=False)
-                
-                if 'entries' in info:
-                    info = info['entries'][0]
-                
-                song = {
-                    'title': info.get('title', 'Unknown Title'),
-                    'url': info.get('webpage_url', query),
-                    'audio_url': info.get('url'),
-                    'duration': info.get('duration', 0),
-                    'requester': interaction.user.name,
-                    'thumbnail': info.get('thumbnail')
-                }
-                
-                # Add to queue
-                if interaction.guild.id not in self.queues:
-                    self.queues[interaction.guild.id] = deque()
-                
-                self.queues[interaction.guild.id].append(song)
+            # Check the limits before spending a lookup on the song
+            queue.check(interaction.user.id)
+            
+            info = self.track_cache.get(query)
+            if info is None:
+                deadline = (interaction.created_at + INTERACTION_LIFETIME).timestamp()
+                info = await self.extractor.extract(interaction.guild.id, query, deadline=deadline)
+                self.track_cache.put(query, info)
+            
+            song = Track(
+                video_id=info.get('id'),
+                title=info.get('title') or 'Unknown Title',
+                url=info.get('webpage_url') or query,
+                audio_url=info.get('url'),
+                duration=info.get('duration') or 0,
+                codec=stream_codec(info),
+                bitrate=stream_bitrate(info),
+                requester=interaction.user.name,
+                requester_id=interaction.user.id,
+                thumbnail=info.get('thumbnail')
+            )
+            
+            # Add to queue
+            queue.append(song)
+            self.snapshots.mark(interaction.guild.id)
+            
+            # Start playing if not already
+            if not self.is_busy(interaction.guild.id):
+                await self.play_next(interaction.guild.id)
+                # A restored queue plays before the new song
+                playing = self.now_playing.get(interaction.guild.id, song)
+                await interaction.followup.send(f"🎵 Now playing: **{playing['title']}**")
+            else:
+                self.prefetcher.schedule(interaction.guild.id, queue)
+                await interaction.followup.send(f"✅ Added to queue: **{song['title']}**")
                 
-                # Start playing if not already
-                if not vc.is_playing():
-                    await self.play_next(interaction.guild.id)
-                    await interaction.followup.send(f"🎵 Now playing: **{song['title']}**")
-                else:
-                    await interaction.followup.send(f"✅ Added to queue: **{song['title']}**")
-                    
+        except (ExtractionError, QueueFull) as e:
+            await interaction.followup.send(f"Error: {e}")
         except Exception as e:
             await interaction.followup.send(f"Error: {str(e)}")
     
-    async def play_next(self, guild_id):
+    async def queue_playlist(self, interaction, queue, url):
+        """Queue the first page of a playlist and start playing, the rest loads in the background"""
+        guild_id = interaction.guild.id
+        try:
+            queue.check(interaction.user.id)
+            deadline = (interaction.created_at + INTERACTION_LIFETIME).timestamp()
+            page = await self.extractor.extract_playlist(guild_id, url, 1, PLAYLIST_FIRST_PAGE, deadline=deadline)
+        except (ExtractionError, QueueFull) as e:
+            await interaction.followup.send(f"Error: {e}")
+            return
+        except Exception as e:
+            await interaction.followup.send(f"Error: {str(e)}")
+            return
+        
+        if not page['entries'] and not playlist_has_more(page, 1, PLAYLIST_FIRST_PAGE):
+            await interaction.followup.send("That playlist is empty")
+            return
+        
+        title = page['title'] or 'the playlist'
+        added = self.add_playlist_entries(queue, page['entries'], interaction.user)
+        self.snapshots.mark(guild_id)
+        
+        # The first track resolves as it starts, the prefetcher resolves the ones after it
+        if not self.is_busy(guild_id):
+            await self.play_next(guild_id)
+        else:
+            self.prefetcher.schedule(guild_id, queue)
+        
+        # Filtered out entries don't end the playlist, only its listing does
+        more = playlist_has_more(page, 1, PLAYLIST_FIRST_PAGE) and queue.room(interaction.user.id) > 0
+        message = await interaction.followup.send(
+            f"📃 Queued {added} songs from **{title}**{', loading more...' if more else ''}", wait=True
+        )
+        
+        if more:
+            task = asyncio.create_task(self.load_playlist(guild_id, interaction.user, queue, url, title, added, message))
+            tasks = self.playlist_tasks.setdefault(guild_id, set())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    
+    async def load_playlist(self, guild_id, user, queue, url, title, added, message):
+        """Queue the rest of a playlist, one page at a time"""
+        start = PLAYLIST_FIRST_PAGE + 1
+        try:
+            while guild_id in self.voice_clients and queue.room(user.id) > 0:
+                end = start + PLAYLIST_PAGE_SIZE - 1
+                page = await self.extractor.extract_playlist(guild_id, url, start, end)
+                
+                # One queue update, prefetch pass and status edit per page
+                added += self.add_playlist_entries(queue, page['entries'], user)
+                self.snapshots.mark(guild_id)
+                self.prefetcher.schedule(guild_id, queue)
+                if not playlist_has_more(page, start, end):
+                    break
+                await self.edit_status(message, f"📃 Queued {added} songs from **{title}**, loading more...")
+                start += PLAYLIST_PAGE_SIZE
+        except Exception as e:
+            logger.error(f"Error loading playlist {url}: {e}")
+        
+        note = " (queue limit reached)" if queue.room(user.id) == 0 else ""
+        await self.edit_status(message, f"📃 Queued {added} songs from **{title}**{note}")
+    
+    async def edit_status(self, message, content):
+        """Edit a followup message, ignoring failures once the interaction has expired"""
+        try:
+            await message.edit(content=content)
+        except discord.HTTPException:
+            pass
+    
+    def add_playlist_entries(self, queue, entries, user):
+        """Append flat playlist entries to a queue in one batch, returns how many fit"""
+        tracks = []
+        for entry in entries[:queue.room(user.id)]:
+            # Streams are resolved when a song comes up, unless a fresh one is cached
+            info = self.track_cache.get(entry['webpage_url']) if entry.get('id') else None
+            fresh = info is not None and bool(info.get('url')) and stream_is_fresh(info['url'])
+            tracks.append(Track(
+                video_id=entry.get('id'),
+                title=entry.get('title') or 'Unknown Title',
+                url=entry['webpage_url'],
+                audio_url=info['url'] if fresh else None,
+                duration=entry.get('duration') or 0,
+                codec=stream_codec(info) if fresh else None,
+                bitrate=stream_bitrate(info) if fresh else None,
+                requester=user.name,
+                requester_id=user.id,
+                thumbnail=entry.get('thumbnail')
+            ))
+        return queue.extend(tracks)
+    
+    def cancel_playlists(self, guild_id):
+        """Stop loading playlists for a guild"""
+        for task in self.playlist_tasks.pop(guild_id, ()):
+            task.cancel()
+    
+    def is_busy(self, guild_id):
+        """Whether a song is playing, paused or being started in a guild"""
+        return (guild_id in self.starting or self.playback.is_playing(guild_id)
+                or self.playback.is_paused(guild_id))
+    
+    async def play_next(self, guild_id, ended_at=None):
         """Play next song in queue"""
-        if guild_id not in self.queues or not self.queues[guild_id]:
+        if guild_id in self.starting:
+            # Another call is already starting the next song
             return
         
+        self.starting.add(guild_id)
+        try:
+            # A song that fails to start is skipped, but not the whole queue
+            for attempt in range(MAX_START_ATTEMPTS):
+                if await self.start_next(guild_id, ended_at):
+                    return
+            logger.warning(f"Stopped playback in guild {guild_id} after {MAX_START_ATTEMPTS} songs failed to start")
+            if self.now_playing.pop(guild_id, None) is not None:
+                self.snapshots.mark(guild_id)
+        finally:
+            self.starting.discard(guild_id)
+    
+    async def start_next(self, guild_id, ended_at=None):
+        """Start the next queued song, returns False if it failed to start"""
+        if guild_id not in self.queues or not self.queues[guild_id]:
+            # The queue ran out, nothing is playing any more
+            if self.now_playing.pop(guild_id, None) is not None:
+                self.snapshots.mark(guild_id)
+            return True
+        
         if guild_id not in self.voice_clients:
-            return
+            return True
         
-        vc = self.voice_clients[guild_id]
         song = self.queues[guild_id].popleft()
         self.now_playing[guild_id] = song
+        self.snapshots.mark(guild_id)
         
         try:
-            # Play audio
-            source = await discord.FFmpegOpusAudio.from_probe(
-                song['audio_url'],
-                **self.ffmpeg_options
-            )
+            # Use the prefetched probe result when there is one
+            await self.prefetcher.wait(song)
             
-            vc.play(source, after=lambda e: asyncio.run_coroutine_threadsafe(
-                self.play_next(guild_id), self.bot.loop
+            # Stream URLs expire after a few hours, refresh it if this one has
+            await self.refresh_stream(guild_id, song)
+            
+            # Probe only when the metadata didn't tell us the codec
+            if not song.get('codec'):
+                await self.probe_song(song)
+            
+            # Play audio, Opus sources are remuxed without re-encoding
+            passthrough = self.playback.play(guild_id, song, after=lambda e: asyncio.run_coroutine_threadsafe(
+                self.play_next(guild_id, time.perf_counter()), self.bot.loop
             ))
+            self.stream_modes['passthrough' if passthrough else 'transcode'] += 1
+            
+            if ended_at is not None:
+                self.prefetcher.record_gap(guild_id, ended_at)
+            
+            # Warm up the songs after this one
+            self.prefetcher.schedule(guild_id, self.queues[guild_id])
+            return True
             
         except Exception as e:
-            print(f"Error playing audio: {e}")
-            await self.play_next(guild_id)
+            logger.error(f"Error playing {song['url']} in guild {guild_id}: {e}")
+            return False
+    
+    async def prepare_song(self, guild_id, song):
+        """Resolve and probe a queued song ahead of time"""
+        await self.refresh_stream(guild_id, song)
+        if not song.get('codec'):
+            await self.probe_song(song)
+    
+    async def probe_song(self, song):
+        """Find a song's codec and bitrate with ffprobe"""
+        codec, bitrate = await discord.FFmpegOpusAudio.probe(song['audio_url'])
+        song['codec'] = codec
+        song['bitrate'] = bitrate or song.get('bitrate')
+    
+    async def refresh_stream(self, guild_id, song):
+        """Re-resolve a song's stream URL if it has expired"""
+        if song['audio_url'] and stream_is_fresh(song['audio_url']):
+            return
+        
+        resolved = bool(song['audio_url'])
+        info = await self.extractor.extract(guild_id, song['url'])
+        song['audio_url'] = info.get('url')
+        # A refreshed URL may point at a different format
+        song['codec'] = stream_codec(info)
+        song['bitrate'] = stream_bitrate(info)
+        if not resolved:
+            # First lookup of a playlist entry
+            song['duration'] = info.get('duration') or song['duration']
+            if song['title'] == 'Unknown Title':
+                song['title'] = info.get('title') or song['title']
+            self.track_cache.put(song['url'], info)
+        elif song.get('id'):
+            self.track_cache.update_stream(song['id'], song['audio_url'])
     
     @app_commands.command(name="pause", description="Pause the current song")
     async def pause(self, interaction: discord.Interaction):
         """Pause command"""
         if interaction.guild.id in self.voice_clients:
-            vc = self.voice_clients[interaction.guild.id]
-            if vc.is_playing():
-                vc.pause()
+            if self.playback.pause(interaction.guild.id):
                 await interaction.response.send_message("⏸️ Music paused")
             else:
                 await interaction.response.send_message("No music is playing")
@@ -136,10 +422,26 @@ class Music(commands.Cog):
     @app_commands.command(name="resume", description="Resume paused music")
     async def resume(self, interaction: discord.Interaction):
         """Resume command"""
-        if interaction.guild.id in self.voice_clients:
-            vc = self.voice_clients[interaction.guild.id]
-            if vc.is_paused():
-                vc.resume()
+        if interaction.guild.id not in self.voice_clients and self.queues.get(interaction.guild.id):
+            # Pick up a queue that was restored after a restart
+            if not interaction.user.voice:
+                await interaction.response.send_message("You need to be in a voice channel!")
+                return
+            
+            await interaction.response.defer()
+            try:
+                vc = await interaction.user.voice.channel.connect()
+            except Exception as e:
+                await interaction.followup.send(f"Failed to connect: {e}")
+                return
+            self.voice_clients[interaction.guild.id] = vc
+            
+            await self.play_next(interaction.guild.id)
+            song = self.now_playing.get(interaction.guild.id)
+            title = song['title'] if song else 'the queue'
+            await interaction.followup.send(f"▶️ Resumed the queue: **{title}**")
+        elif interaction.guild.id in self.voice_clients:
+            if self.playback.resume(interaction.guild.id):
                 await interaction.response.send_message("▶️ Music resumed")
             else:
                 await interaction.response.send_message("Music is not paused")
@@ -150,9 +452,7 @@ class Music(commands.Cog):
     async def skip(self, interaction: discord.Interaction):
         """Skip command"""
         if interaction.guild.id in self.voice_clients:
-            vc = self.voice_clients[interaction.guild.id]
-            if vc.is_playing():
-                vc.stop()
+            if self.playback.skip(interaction.guild.id):
                 await interaction.response.send_message("⏭️ Skipped current song")
             else:
                 await interaction.response.send_message("No music is playing")
@@ -160,19 +460,70 @@ class Music(commands.Cog):
             await interaction.response.send_message("Not connected to voice channel")
     
     @app_commands.command(name="queue", description="Show the current music queue")
-    async def queue(self, interaction: discord.Interaction):
+    @app_commands.describe(page="Queue page")
+    async def queue(self, interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1):
         """Queue command"""
         if interaction.guild.id not in self.queues or not self.queues[interaction.guild.id]:
             await interaction.response.send_message("Queue is empty")
             return
         
-        queue_list = self.queues[interaction.guild.id]
-        message = "**Music Queue:**\n"
+        queue = self.queues[interaction.guild.id]
+        pages = (len(queue) + QUEUE_PAGE_SIZE - 1) // QUEUE_PAGE_SIZE
+        page = min(page, pages)
         
-        for i, song in enumerate(queue_list, 1):
-            message += f"{i}. {song['title']} (Requested by: {song['requester']})\n"
+        # Only the visible page is rendered
+        lines = [f"**Music Queue** ({len(queue)} songs, page {page}/{pages}):"]
+        for position, song in queue.page(page, QUEUE_PAGE_SIZE):
+            lines.append(f"{position}. {song.title[:80]} (Requested by: {song.requester})")
         
-        await interaction.response.send_message(message[:1900])
+        await interaction.response.send_message("\n".join(lines))
+    
+    @app_commands.command(name="remove", description="Remove a song from the queue")
+    @app_commands.describe(position="Position in the queue")
+    async def remove(self, interaction: discord.Interaction, position: app_commands.Range[int, 1]):
+        """Remove a queued song"""
+        queue = self.queues.get(interaction.guild.id)
+        if not queue or position > len(queue):
+            await interaction.response.send_message("There is no song at that position")
+            return
+        
+        song = queue[position - 1]
+        if song.requester_id != interaction.user.id and not interaction.user.guild_permissions.manage_channels:
+            await interaction.response.send_message("You can only remove songs you queued", ephemeral=True)
+            return
+        
+        queue.remove(position - 1)
+        self.snapshots.mark(interaction.guild.id)
+        self.prefetcher.schedule(interaction.guild.id, queue)
+        await interaction.response.send_message(f"🗑️ Removed **{song.title}** from the queue")
+    
+    @app_commands.command(name="move", description="Move a song to another position in the queue")
+    @app_commands.describe(position="Current position", new_position="New position")
+    async def move(self, interaction: discord.Interaction, position: app_commands.Range[int, 1], new_position: app_commands.Range[int, 1]):
+        """Move a queued song"""
+        queue = self.queues.get(interaction.guild.id)
+        if not queue or position > len(queue):
+            await interaction.response.send_message("There is no song at that position")
+            return
+        
+        new_position = min(new_position, len(queue))
+        song = queue.move(position - 1, new_position - 1)
+        self.snapshots.mark(interaction.guild.id)
+        self.prefetcher.schedule(interaction.guild.id, queue)
+        await interaction.response.send_message(f"↕️ Moved **{song.title}** to position {new_position}")
+    
+    @app_commands.command(name="shuffle", description="Shuffle the queue")
+    async def shuffle(self, interaction: discord.Interaction):
+        """Shuffle command"""
+        queue = self.queues.get(interaction.guild.id)
+        if not queue:
+            await interaction.response.send_message("Queue is empty")
+            return
+        
+        queue.shuffle()
+        self.snapshots.mark(interaction.guild.id)
+        self.prefetcher.schedule(interaction.guild.id, queue)
+        await interaction.response.send_message(f"🔀 Shuffled {len(queue)} songs")
     
     @app_commands.command(name="volume", description="Set the volume (1-100)")
     @app_commands.describe(level="Volume level (1-100)")
@@ -183,9 +534,14 @@ class Music(commands.Cog):
             return
         
         if interaction.guild.id in self.voice_clients:
-            vc = self.voice_clients[interaction.guild.id]
-            vc.source.volume = level / 100
-            await interaction.response.send_message(f"🔊 Volume set to {level}%")
+            self.snapshots.mark(interaction.guild.id)
+            if self.playback.set_volume(interaction.guild.id, level / 100):
+                await interaction.response.send_message(f"🔊 Volume set to {level}%")
+            else:
+                # Passed through or filtered songs can't change volume without restarting
+                await interaction.response.send_message(
+                    f"🔊 Volume set to {level}%, this takes effect from the next song"
+                )
         else:
             await interaction.response.send_message("Not connected to voice channel")
     
@@ -193,18 +549,8 @@ class Music(commands.Cog):
     async def stop(self, interaction: discord.Interaction):
         """Stop command"""
         if interaction.guild.id in self.voice_clients:
-            vc = self.voice_clients[interaction.guild.id]
-            
-            # Clear queue
-            if interaction.guild.id in self.queues:
-                self.queues[interaction.guild.id].clear()
-            
-            # Stop playing
-            vc.stop()
-            
-            # Disconnect
-            await vc.disconnect()
-            del self.voice_clients[interaction.guild.id]
+            # Clear queue, stop playing and disconnect
+            await self.release_guild(interaction.guild.id)
             
             await interaction.response.send_message("⏹️ Music stopped and queue cleared")
         else:
@@ -216,29 +562,54 @@ class Music(commands.Cog):
         if guild_id not in self.voice_clients:
             return False
         
-        vc = self.voice_clients[guild_id]
-        
         if action == 'pause':
-            if vc.is_playing():
-                vc.pause()
-                return True
+            return self.playback.pause(guild_id)
         elif action == 'resume':
-            if vc.is_paused():
-                vc.resume()
-                return True
+            return self.playback.resume(guild_id)
         elif action == 'skip':
-            if vc.is_playing():
-                vc.stop()
+            return self.playback.skip(guild_id)
+        elif action == 'volume':
+            level = data.get('level')
+            if isinstance(level, int) and 1 <= level <= 100:
+                self.playback.set_volume(guild_id, level / 100)
+                self.snapshots.mark(guild_id)
                 return True
         elif action == 'stop':
-            vc.stop()
-            if guild_id in self.voice_clients:
-                await vc.disconnect()
-                del self.voice_clients[guild_id]
-            return True
+            return await self.release_guild(guild_id)
         
         return False
     
+    def idle_reason(self, guild_id):
+        """Why a guild's voice session is idle, or None while it is in use"""
+        vc = self.voice_clients.get(guild_id)
+        if vc is None:
+            return None
+        listeners = vc.channel is None or any(not member.bot for member in vc.channel.members)
+        return session_idle_reason(listeners, self.is_busy(guild_id), bool(self.queues.get(guild_id)))
+    
+    async def release_guild(self, guild_id, reason='stop'):
+        """Leave voice and drop everything kept for a guild"""
+        self.cancel_playlists(guild_id)
+        self.prefetcher.cancel(guild_id)
+        self.prefetcher.forget(guild_id)
+        self.reaper.forget(guild_id)
+        # Drop the queue first so the stopped song doesn't start the next one
+        queue = self.queues.pop(guild_id, None)
+        if queue is not None:
+            queue.clear()
+        self.now_playing.pop(guild_id, None)
+        self.snapshots.mark(guild_id)
+        return await self.playback.disconnect(guild_id)
+    
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        """Release a guild's music state when the bot is disconnected from voice"""
+        if member.id != self.bot.user.id or after.channel is not None:
+            return
+        if member.guild.id in self.voice_clients:
+            await self.release_guild(member.guild.id)
+            self.reaper.record(member.guild.id, 'disconnected')
+    
     def get_guild_status(self, guild_id):
         """Get music status for a guild"""
         status = {
@@ -246,21 +617,57 @@ class Music(commands.Cog):
             'is_playing': False,
             'is_paused': False,
             'now_playing': None,
-            'queue_length': 0
+            'queue_length': 0,
+            'pending_lookups': self.extractor.queue_depth(guild_id),
+            'transitions': self.prefetcher.gap_stats(guild_id),
+            'memory_bytes': 0,
+            'volume': round(self.playback.volumes.get(guild_id, 1.0) * 100),
+            'idle': None
         }
         
+        idle = self.reaper.idle_for(guild_id)
+        if idle:
+            status['idle'] = {'reason': idle[0], 'seconds': int(idle[1])}
+        
         if guild_id in self.voice_clients:
-            vc = self.voice_clients[guild_id]
-            status['is_playing'] = vc.is_playing()
-            status['is_paused'] = vc.is_paused()
+            status['is_playing'] = self.playback.is_playing(guild_id)
+            status['is_paused'] = self.playback.is_paused(guild_id)
             
         if guild_id in self.now_playing:
             status['now_playing'] = self.now_playing[guild_id]
         
         if guild_id in self.queues:
             status['queue_length'] = len(self.queues[guild_id])
+            status['memory_bytes'] = self.queues[guild_id].memory_usage()
         
         return status
 
+    def get_extractor_stats(self):
+        """Get song lookup queue stats"""
+        return self.extractor.get_stats()
+    
+    def get_prefetch_stats(self):
+        """Get prefetch stats"""
+        return {**self.prefetcher.get_stats(), **self.stream_modes}
+    
+    def get_resource_stats(self):
+        """Get live voice resource counts"""
+        return {
+            'connections': len(self.voice_clients),
+            'ffmpeg_processes': self.playback.active_streams(),
+            'queued_tracks': sum(len(queue) for queue in self.queues.values()),
+            'guild_states': len(set(self.queues) | set(self.now_playing) | set(self.voice_clients)),
+            **self.reaper.get_stats()
+        }
+    
+    async def cog_unload(self):
+        # Save queues before anything else is torn down
+        await self.snapshots.stop()
+        await self.reaper.stop()
+        for guild_id in list(self.playlist_tasks):
+            self.cancel_playlists(guild_id)
+        self.extractor.shutdown()
+        self.track_cache.save()
+
 async def setup(bot):
     await bot.add_cog(Music(bot))
@@ -4,20 +4,53 @@ from discord import app_commands
 from discord.ui import Button, View, Select
 import asyncio
 from datetime import datetime
+from utils.components import detached
+from utils.ticket_index import TicketIndex
 
 class TicketView(View):
-    def __init__(self, cog):
+    """Ticket panel button, clicks are handled by Tickets.on_create_ticket"""
+    def __init__(self):
         super().__init__(timeout=None)
-        self.cog = cog
-    
-    @discord.ui.button(label="Create Ticket", style=discord.ButtonStyle.primary, custom_id="create_ticket")
-    async def create_ticket(self, interaction: discord.Interaction, button: Button):
-        await self.cog.create_ticket_command(interaction)
+        self.add_item(Button(label="Create Ticket", style=discord.ButtonStyle.primary, custom_id="create_ticket"))
+
+class CloseTicketView(View):
+    """Close button in a ticket channel, clicks are handled by Tickets.on_close_ticket"""
+    def __init__(self, ticket_id):
+        super().__init__(timeout=None)
+        self.add_item(Button(label="Close Ticket", style=discord.ButtonStyle.danger, custom_id=f"close_{ticket_id}"))
 
 class Tickets(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.ticket_channels = {}
+        self.ticket_index = TicketIndex(bot.db)
+        self.creating = set()
+        self.load_task = None
+    
+    async def cog_load(self):
+        # Load open tickets in the background so startup isn't blocked
+        self.load_task = asyncio.create_task(self.ticket_index.load())
+        
+        # Buttons on ticket panels and in ticket channels, including ones sent before a restart
+        self.bot.components.register('create_ticket', self.on_create_ticket)
+        self.bot.components.register('close', self.on_close_ticket)
+    
+    async def cog_unload(self):
+        self.bot.components.unregister('create_ticket')
+        self.bot.components.unregister('close')
+    
+    async def on_create_ticket(self, interaction: discord.Interaction, argument: str):
+        """Create Ticket button on a ticket panel"""
+        await self.create_ticket_command(interaction)
+    
+    async def on_close_ticket(self, interaction: discord.Interaction, argument: str):
+        """Close Ticket button, the custom_id is close_<ticket id>"""
+        ticket_id = int(argument)
+        await self.ticket_index.wait_ready()
+        if self.ticket_index.by_channel(interaction.channel.id) != ticket_id:
+            await interaction.response.send_message("This ticket is already closed!", ephemeral=True)
+            return
+        
+        await self.close_ticket(interaction, ticket_id, "Closed via button")
     
     @app_commands.command(name="ticket", description="Ticket system commands")
     @app_commands.describe(action="Action to perform", topic="Ticket topic (for create)", user="User (for add/remove)", reason="Reason (for close)")
@@ -43,15 +76,20 @@ class Tickets(commands.Cog):
             topic = "No topic provided"
         
         # Check if user already has open ticket
-        existing = await self.bot.db.fetchone('''
-            SELECT * FROM tickets 
-            WHERE guild_id = ? AND user_id = ? AND status = 'open'
-        ''', (interaction.guild.id, interaction.user.id))
-        
-        if existing:
+        await self.ticket_index.wait_ready()
+        key = (interaction.guild.id, interaction.user.id)
+        if self.ticket_index.by_user(*key) or key in self.creating:
             await interaction.followup.send("You already have an open ticket!", ephemeral=True)
             return
         
+        self.creating.add(key)
+        try:
+            await self.open_ticket(interaction, topic)
+        finally:
+            self.creating.discard(key)
+    
+    async def open_ticket(self, interaction: discord.Interaction, topic: str):
+        """Create the ticket channel and record the ticket"""
         # Get ticket category
         settings = await self.bot.db.get_guild_settings(interaction.guild.id)
         category_id = settings['ticket_category_id'] if settings else None
@@ -62,7 +100,9 @@ class Tickets(commands.Cog):
         
         if not category:
             # Create category if it doesn't exist
-            category = await interaction.guild.create_category("Tickets")
+            category = await self.bot.outbound.call(
+                ('channel', interaction.guild.id), lambda: interaction.guild.create_category("Tickets")
+            )
             await self.bot.db.update_guild_settings(interaction.guild.id, ticket_category_id=category.id)
         
         # Create ticket channel
@@ -72,9 +112,9 @@ class Tickets(commands.Cog):
             interaction.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_channels=True)
         }
         
-        ticket_channel = await category.create_text_channel(
-            f"ticket-{interaction.user.name}",
-            overwrites=overwrites
+        ticket_channel = await self.bot.outbound.call(
+            ('channel', interaction.guild.id),
+            lambda: category.create_text_channel(f"ticket-{interaction.user.name}", overwrites=overwrites)
         )
         
         # Add to database
@@ -86,7 +126,7 @@ class Tickets(commands.Cog):
         )
         
         # Store mapping
-        self.ticket_channels[ticket_channel.id] = ticket_id
+        self.ticket_index.add(ticket_id, interaction.guild.id, interaction.user.id, ticket_channel.id)
         
         # Send welcome message
         embed = discord.Embed(
@@ -98,27 +138,20 @@ class Tickets(commands.Cog):
         embed.timestamp = datetime.utcnow()
         
         # Add close button
-        close_button = Button(label="Close Ticket", style=discord.ButtonStyle.danger, custom_id=f"close_{ticket_id}")
+        view = detached(CloseTicketView(ticket_id))
         
-        async def close_callback(interaction: discord.Interaction):
-            await self.close_ticket(interaction, ticket_id, "Closed via button")
-        
-        close_button.callback = close_callback
-        
-        view = View()
-        view.add_item(close_button)
-        
-        await ticket_channel.send(embed=embed, view=view)
+        await self.bot.outbound.call(('message', ticket_channel.id), lambda: ticket_channel.send(embed=embed, view=view))
         await interaction.followup.send(f"✅ Ticket created: {ticket_channel.mention}", ephemeral=True)
     
     async def close_ticket_command(self, interaction: discord.Interaction, reason: str):
         """Close a ticket"""
         # Check if this is a ticket channel
-        if interaction.channel.id not in self.ticket_channels:
+        await self.ticket_index.wait_ready()
+        ticket_id = self.ticket_index.by_channel(interaction.channel.id)
+        if ticket_id is None:
             await interaction.response.send_message("This is not a ticket channel!", ephemeral=True)
             return
         
-        ticket_id = self.ticket_channels[interaction.channel.id]
         await self.close_ticket(interaction, ticket_id, reason)
     
     async def close_ticket(self, interaction: discord.Interaction, ticket_id: int, reason: str):
@@ -132,6 +165,7 @@ class Tickets(commands.Cog):
                 closed_by = ?, closed_reason = ?
             WHERE ticket_id = ?
         ''', (interaction.user.id, reason, ticket_id))
+        self.ticket_index.remove(ticket_id)
         
         # Send closing message
         embed = discord.Embed(
@@ -142,22 +176,19 @@ class Tickets(commands.Cog):
         embed.set_footer(text=f"Closed by {interaction.user}", icon_url=interaction.user.avatar.url)
         embed.timestamp = datetime.utcnow()
         
-        await interaction.channel.send(embed=embed)
+        await self.bot.outbound.call(('message', interaction.channel.id), lambda: interaction.channel.send(embed=embed))
         
         # Delete channel after delay
         await asyncio.sleep(10)
         try:
-            await interaction.channel.delete()
+            await self.bot.outbound.call(('channel', interaction.guild.id), lambda: interaction.channel.delete())
         except:
             pass
-        
-        # Remove from mapping
-        if interaction.channel.id in self.ticket_channels:
-            del self.ticket_channels[interaction.channel.id]
     
     async def add_user_command(self, interaction: discord.Interaction, user: discord.Member):
         """Add user to ticket"""
-        if interaction.channel.id not in self.ticket_channels:
+        await self.ticket_index.wait_ready()
+        if self.ticket_index.by_channel(interaction.channel.id) is None:
             await interaction.response.send_message("This is not a ticket channel!", ephemeral=True)
             return
         
@@ -167,7 +198,8 @@ class Tickets(commands.Cog):
     
     async def remove_user_command(self, interaction: discord.Interaction, user: discord.Member):
         """Remove user from ticket"""
-        if interaction.channel.id not in self.ticket_channels:
+        await self.ticket_index.wait_ready()
+        if self.ticket_index.by_channel(interaction.channel.id) is None:
             await interaction.response.send_message("This is not a ticket channel!", ephemeral=True)
             return
         
@@ -186,7 +218,7 @@ class Tickets(commands.Cog):
             color=discord.Color.green()
         )
         
-        view = TicketView(self)
+        view = detached(TicketView())
         await interaction.response.send_message(embed=embed, view=view)
     
     # Web dashboard methods
@@ -200,6 +232,7 @@ class Tickets(commands.Cog):
                     closed_by = 0, closed_reason = ?
                 WHERE ticket_id = ?
             ''', (data.get('reason', 'Closed via web'), ticket_id))
+            self.ticket_index.remove(ticket_id)
             return {'success': True}
         
         return {'success': False}
@@ -9,6 +9,10 @@ class Troll(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = bot.logger
+    
+    async def interaction_check(self, interaction: discord.Interaction):
+        # Per-user cooldowns, /mock reads channel history on every use
+        return await self.bot.check_cooldown(interaction)
         
     @app_commands.command(name="mock", description="Mock a user (fun, not harmful)")
     @app_commands.describe(user="User to mock", message="Custom message (optional)")
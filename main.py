@@ -1,47 +1,134 @@
 import discord
 from discord.ext import commands
+from discord import app_commands
 import asyncio
+import importlib
 import logging
 import os
+import time
+from utils.command_sync import sync_if_changed
+from utils.components import ComponentRouter
+from utils.cooldowns import CooldownStore, cooldown_for
 from utils.database import Database
 from utils.logger import setup_logger
+from utils.outbound import OutboundScheduler
 import web_ui
 
 # Setup logging
 logger = setup_logger()
 
 class DiscordBot(commands.Bot):
-    def __init__(self):
+    def __init__(self, force_sync=False):
         intents = discord.Intents.default()
         intents.message_content = True
         intents.members = True
         super().__init__(command_prefix="!", intents=intents, help_command=None)
         self.db = Database()
         self.logger = logger
+        self.cog_timings = []
+        self.force_sync = force_sync
+        # Buttons on persistent messages are dispatched by custom_id
+        self.components = ComponentRouter()
+        # Rate limits bursts of REST calls before Discord has to
+        self.outbound = OutboundScheduler()
+        # Per-user command rate limits, see check_cooldown
+        self.cooldowns = CooldownStore()
+    
+    async def load_cogs(self):
+        """Load every cog concurrently and record how long each one took"""
+        names = sorted(
+            filename[:-3] for filename in os.listdir('./cogs')
+            if filename.endswith('.py') and not filename.startswith('_')
+        )
+        loop = asyncio.get_running_loop()
+        
+        async def load(name):
+            timing = {'cog': name, 'import_ms': 0.0, 'setup_ms': 0.0, 'error': None}
+            start = time.perf_counter()
+            try:
+                # Import in a worker thread first so cogs pull in their
+                # dependencies in parallel. load_extension executes the cog
+                # module again from its spec, so the cog's own top-level code
+                # runs twice; only the modules it imports are already loaded
+                await loop.run_in_executor(None, importlib.import_module, f'cogs.{name}')
+                imported = time.perf_counter()
+                timing['import_ms'] = (imported - start) * 1000
+                
+                await self.load_extension(f'cogs.{name}')
+                timing['setup_ms'] = (time.perf_counter() - imported) * 1000
+            except Exception as e:
+                timing['error'] = str(e)
+                logger.error(f'Failed to load cog {name}: {e}')
+            return timing
+        
+        start = time.perf_counter()
+        self.cog_timings = await asyncio.gather(*(load(name) for name in names))
+        total_ms = (time.perf_counter() - start) * 1000
         
+        # Startup timing table
+        logger.info(f'{"Cog":<14}{"Import":>10}{"Setup":>10}  Status')
+        for timing in self.cog_timings:
+            status = f'FAILED: {timing["error"]}' if timing['error'] else 'loaded'
+            logger.info(f'{timing["cog"]:<14}{timing["import_ms"]:>8.1f}ms{timing["setup_ms"]:>8.1f}ms  {status}')
+        logger.info(f'Loaded {sum(not t["error"] for t in self.cog_timings)}/{len(names)} cogs in {total_ms:.1f}ms')
+    
     async def setup_hook(self):
+        self.outbound.start()
+        self.cooldowns.start()
+        self.tree.error(self.on_app_command_error)
+        
         # Load cogs
-        for filename in os.listdir('./cogs'):
-            if filename.endswith('.py') and not filename.startswith('_'):
-                try:
-                    await self.load_extension(f'cogs.{filename[:-3]}')
-                    logger.info(f'Loaded cog: {filename}')
-                except Exception as e:
-                    logger.error(f'Failed to load cog {filename}: {e}')
-        
-        # Sync slash commands
-        await self.tree.sync()
-        logger.info('Slash commands synced!')
+        await self.load_cogs()
+        
+        # Sync slash commands, only when they changed since the last sync
+        await sync_if_changed(self.tree, self.db, force=self.force_sync)
         
+    async def check_cooldown(self, interaction: discord.Interaction):
+        """Cog interaction check, raises CommandOnCooldown while a user is over the command's limit"""
+        if interaction.command is None:
+            return True
+        command = interaction.command.qualified_name
+        settings = await self.db.get_guild_settings(interaction.guild_id) if interaction.guild_id else None
+        limit = cooldown_for(command, settings)
+        if limit is None:
+            return True
+        
+        retry_after = self.cooldowns.hit(command, interaction.guild_id or 0, interaction.user.id, *limit)
+        if retry_after:
+            raise app_commands.CommandOnCooldown(app_commands.Cooldown(*limit), retry_after)
+        return True
+    
+    async def on_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.CommandOnCooldown):
+            message = f"⏳ Slow down! You can use this command again in {error.retry_after:.1f}s."
+            if interaction.response.is_done():
+                await interaction.followup.send(message, ephemeral=True)
+            else:
+                await interaction.response.send_message(message, ephemeral=True)
+            return
+        
+        name = interaction.command.qualified_name if interaction.command else 'unknown'
+        logger.error(f'Error in command {name}: {error}', exc_info=error)
+    
+    async def on_interaction(self, interaction: discord.Interaction):
+        await self.components.dispatch(interaction)
+    
     async def on_ready(self):
         logger.info(f'{self.user} has connected to Discord!')
         logger.info(f'Bot is in {len(self.guilds)} guilds')
         
         # Start web UI
         await web_ui.start_web_server(self, self.db)
+    
+    async def close(self):
+        await super().close()
+        await self.outbound.stop()
+        await self.cooldowns.stop()
+        # Flush pending writes after cogs have unloaded
+        await self.db.close()
 
-async def main():
-    bot = DiscordBot()
+async def main(force_sync=False):
+    bot = DiscordBot(force_sync=force_sync)
     
     # Start bot with token from environment
     token = os.getenv('DISCORD_TOKEN')
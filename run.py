@@ -2,9 +2,15 @@
 """
 Run script for Discord Bot
 """
+import argparse
 import os
 import sys
 
+parser = argparse.ArgumentParser(description="Run the Discord bot")
+parser.add_argument('--force-sync', action='store_true',
+                    help="Sync slash commands even if they haven't changed")
+args = parser.parse_args()
+
 # Check for required token
 if not os.getenv('DISCORD_TOKEN'):
     print("Error: DISCORD_TOKEN environment variable not set!")
@@ -18,4 +24,4 @@ import asyncio
 from main import main
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    asyncio.run(main(force_sync=args.force_sync))
@@ -0,0 +1,73 @@
+import unittest
+
+from utils.command_sync import SETTING_KEY, sync_if_changed
+
+
+class FakeCommand:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+
+    def to_dict(self, tree=None):
+        return {'type': 1, 'name': self.name, 'description': self.description}
+
+
+class FakeClient:
+    application_id = 1234
+
+
+class FakeTree:
+    def __init__(self, commands):
+        self.client = FakeClient()
+        self.commands = commands
+        self.syncs = 0
+
+    def get_commands(self):
+        return list(self.commands)
+
+    async def sync(self):
+        self.syncs += 1
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.settings = {}
+
+    async def get_bot_setting(self, key):
+        return self.settings.get(key)
+
+    async def set_bot_setting(self, key, value):
+        self.settings[key] = value
+
+
+class SyncIfChangedTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tree = FakeTree([FakeCommand('play', 'Play a song'), FakeCommand('skip', 'Skip the song')])
+        self.db = FakeDatabase()
+
+    async def test_unchanged_tree_skips_sync(self):
+        self.assertTrue(await sync_if_changed(self.tree, self.db))
+        self.assertFalse(await sync_if_changed(self.tree, self.db))
+        self.assertEqual(self.tree.syncs, 1)
+        self.assertIn(SETTING_KEY, self.db.settings)
+
+    async def test_command_order_does_not_matter(self):
+        await sync_if_changed(self.tree, self.db)
+        self.tree.commands.reverse()
+        self.assertFalse(await sync_if_changed(self.tree, self.db))
+        self.assertEqual(self.tree.syncs, 1)
+
+    async def test_changed_tree_syncs(self):
+        await sync_if_changed(self.tree, self.db)
+        self.tree.commands[0] = FakeCommand('play', 'Play a song or playlist')
+        self.assertTrue(await sync_if_changed(self.tree, self.db))
+        self.assertEqual(self.tree.syncs, 2)
+
+    async def test_force_syncs_unchanged_tree(self):
+        await sync_if_changed(self.tree, self.db)
+        self.assertTrue(await sync_if_changed(self.tree, self.db, force=True))
+        self.assertEqual(self.tree.syncs, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import asyncio
+import time
+import unittest
+
+from utils.extractor import ExtractionError, ExtractionPool
+
+
+def slow_lookup(query, ydl_opts):
+    """Stands in for yt-dlp, runs in the worker process"""
+    started = time.time()
+    time.sleep(query)
+    return {'started': started, 'ended': time.time()}
+
+
+class ExtractionPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pool = ExtractionPool({}, max_workers=1, per_guild=1, timeout=0.3, extract_func=slow_lookup)
+        # Start the worker process up front so spawning doesn't count against the timeouts
+        self.pool.timeout = 30
+        await self.pool.extract(1, 0)
+        self.pool.timeout = 0.3
+
+    async def asyncTearDown(self):
+        self.pool.shutdown()
+
+    async def test_timed_out_job_keeps_its_slot(self):
+        with self.assertRaises(ExtractionError):
+            await self.pool.extract(1, 1.0)
+        # The first job is still running in the worker, so it still counts
+        self.assertEqual(self.pool.running, 1)
+
+        self.pool.timeout = 5
+        start = time.time()
+        result = await self.pool.extract(2, 0)
+        # The next lookup only started once the timed out one finished
+        self.assertGreaterEqual(result['started'] - start, 0.5)
+        self.assertEqual(self.pool.running, 0)
+
+    async def test_bound_holds_after_repeated_timeouts(self):
+        for guild_id in range(3):
+            with self.assertRaises(ExtractionError):
+                await self.pool.extract(guild_id, 0.5)
+            self.assertLessEqual(self.pool.running, 1)
+
+        await asyncio.sleep(1.2)
+        self.assertEqual(self.pool.running, 0)
+        self.assertEqual(self.pool._guild_slots, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from utils.idle import IdleReaper, session_idle_reason
+
+
+class SessionIdleReasonTest(unittest.TestCase):
+    def test_paused_session_is_in_use(self):
+        self.assertIsNone(session_idle_reason(listeners=True, busy=True, queued=False))
+        self.assertIsNone(session_idle_reason(listeners=True, busy=True, queued=True))
+
+    def test_queued_songs_keep_a_session_in_use(self):
+        self.assertIsNone(session_idle_reason(listeners=True, busy=False, queued=True))
+
+    def test_idle_only_with_nothing_playing_or_queued(self):
+        self.assertEqual(session_idle_reason(listeners=True, busy=False, queued=False), 'idle')
+
+    def test_empty_channel(self):
+        self.assertEqual(session_idle_reason(listeners=False, busy=True, queued=True), 'empty')
+
+
+class IdleReaperTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # One guild paused with songs queued, one with nothing left to play
+        self.sessions = {1: {'busy': True, 'queued': True}, 2: {'busy': False, 'queued': False}}
+        self.released = []
+        self.reaper = IdleReaper(
+            lambda: list(self.sessions),
+            lambda guild_id: session_idle_reason(True, **self.sessions[guild_id]),
+            self.release,
+            {'empty': 60, 'idle': 300}
+        )
+
+    async def release(self, guild_id, reason):
+        self.released.append((guild_id, reason))
+        del self.sessions[guild_id]
+
+    async def test_paused_session_outlives_the_idle_timeout(self):
+        for minute in range(0, 30, 5):
+            await self.reaper.sweep(now=minute * 60.0)
+
+        self.assertEqual(self.released, [(2, 'idle')])
+        self.assertIn(1, self.sessions)
+        self.assertIsNone(self.reaper.idle_for(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
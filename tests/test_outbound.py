@@ -0,0 +1,138 @@
+import asyncio
+import time
+import unittest
+
+from utils.outbound import COSMETIC, MODERATION, NORMAL, OutboundScheduler, TokenBucket
+
+# Small limits so bursts hit them quickly. The windows are far shorter than
+# Discord's, so the scheduler gets a bigger margin to keep the same slack for
+# connection jitter as the default 10% gives against the real limits.
+MARGIN = 0.5
+LIMITS = {'message': (2, 0.2), 'reaction': (1, 0.1), 'member': (2, 0.2)}
+
+
+class RateLimited(Exception):
+    status = 429
+
+
+class FakeAPI:
+    """Local HTTP server enforcing per-route token buckets, 429 when one is empty"""
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.buckets = {}
+        self.paths = []
+        self.limited = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        path = request_line.decode().split(' ')[1]
+        kind, major, _ = path.strip('/').split('/', 2)
+
+        now = time.monotonic()
+        bucket = self.buckets.get((kind, major))
+        if bucket is None:
+            bucket = self.buckets[(kind, major)] = TokenBucket(*self.limits[kind], now)
+        if bucket.delay(now):
+            self.limited += 1
+            status = b'429 Too Many Requests'
+        else:
+            bucket.take()
+            self.paths.append(path)
+            status = b'200 OK'
+        writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+        await writer.drain()
+        writer.close()
+
+    async def request(self, path):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(f'POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: 0\r\n\r\n'.encode())
+        await writer.drain()
+        status = await reader.readline()
+        writer.close()
+        if b' 429 ' in status:
+            raise RateLimited(path)
+        return path
+
+
+class OutboundSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.api = FakeAPI(LIMITS)
+        await self.api.start()
+        self.outbound = OutboundScheduler(global_limit=(100, 1.0), limits=LIMITS, margin=MARGIN)
+        self.outbound.start()
+
+    async def asyncTearDown(self):
+        await self.outbound.stop()
+        await self.api.close()
+
+    def call(self, kind, major, name, priority=NORMAL, coalesce=None):
+        path = f'/{kind}/{major}/{name}'
+        return self.outbound.submit((kind, major), lambda: self.api.request(path), priority, coalesce)
+
+    async def test_burst_stays_under_the_limits(self):
+        # A suggestion burst: a message and two reactions each, in two channels
+        calls = []
+        for i in range(4):
+            for channel in (1, 2):
+                calls.append(self.call('message', channel, f'send{i}'))
+                calls.append(self.call('reaction', channel, f'yes{i}', COSMETIC))
+                calls.append(self.call('reaction', channel, f'no{i}', COSMETIC))
+        results = await asyncio.gather(*calls)
+
+        self.assertEqual(self.api.limited, 0)
+        self.assertEqual(self.outbound.rate_limited, 0)
+        self.assertEqual(len(results), 24)
+        self.assertEqual(sorted(results), sorted(self.api.paths))
+
+    async def test_moderation_goes_before_cosmetic_calls(self):
+        cosmetic = [self.call('member', 1, f'role{i}', COSMETIC) for i in range(6)]
+        ban = self.call('member', 1, 'ban', MODERATION)
+        await asyncio.gather(ban, *cosmetic)
+
+        # Only calls that were already allowed out can beat it
+        self.assertLessEqual(self.api.paths.index('/member/1/ban'), LIMITS['member'][0])
+        self.assertEqual(self.api.limited, 0)
+
+    async def test_edits_of_one_message_coalesce(self):
+        edits = [self.call('message', 1, f'edit{i}', COSMETIC, coalesce=('edit', 1)) for i in range(10)]
+        results = await asyncio.gather(*edits)
+
+        # Queued together, only the latest edit is sent and every caller gets its result
+        self.assertEqual(self.api.paths, ['/message/1/edit9'])
+        self.assertEqual(results, ['/message/1/edit9'] * 10)
+        self.assertEqual(self.outbound.coalesced, 9)
+
+    async def test_server_rate_limit_fails_the_call_and_drains_the_route(self):
+        # Use up the fake API's bucket behind the scheduler's back
+        await self.api.request('/message/3/other')
+        await self.api.request('/message/3/other')
+
+        with self.assertRaises(RateLimited):
+            await self.call('message', 3, 'send')
+        self.assertEqual(self.outbound.rate_limited, 1)
+        self.assertGreater(self.outbound._routes[('message', 3)].bucket.delay(time.monotonic()), 0)
+
+    async def test_cancelled_call_does_not_hang_the_caller(self):
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        future = self.outbound.submit(('message', 4), cancelled)
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(future, timeout=1)
+        self.assertTrue(future.cancelled())
+
+
+if __name__ == '__main__':
+    unittest.main()
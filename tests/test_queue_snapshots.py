@@ -0,0 +1,88 @@
+import asyncio
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from utils.database import Database
+from utils.queue_snapshots import QueueSnapshots
+
+ROOT = Path(__file__).resolve().parent.parent
+
+GUILD_ID = 42
+
+# Runs in a separate process that is killed once its queue has been saved
+BOT_PROCESS = textwrap.dedent('''
+    import asyncio
+    import sys
+
+    from utils.database import Database
+    from utils.music_queue import MusicQueue, Track
+    from utils.queue_snapshots import QueueSnapshots
+
+    async def main(path):
+        db = Database(path)
+        queue = MusicQueue()
+        queue.extend([
+            Track(video_id=f'id{i}', title=f'Song {i}', url=f'https://youtu.be/id{i}',
+                  requester='user', requester_id=i % 3)
+            for i in range(20)
+        ])
+        # Reorder the queue the way /move and /remove do
+        queue.move(5, 0)
+        queue.remove(10)
+        playing = queue.popleft()
+
+        def state(guild_id):
+            return [playing] + list(queue), 0.5
+
+        snapshots = QueueSnapshots(db, state, interval=0.05)
+        snapshots.start()
+        snapshots.mark(42)
+        while not snapshots.written:
+            await asyncio.sleep(0.01)
+
+        print(','.join(track['title'] for track in state(42)[0]), flush=True)
+        await asyncio.sleep(3600)
+
+    asyncio.run(main(sys.argv[1]))
+''')
+
+
+class RestoreAfterKillTest(unittest.TestCase):
+    def test_killed_process_resumes_same_queue_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / 'bot.db')
+            process = subprocess.Popen(
+                [sys.executable, '-c', BOT_PROCESS, path],
+                cwd=ROOT, stdout=subprocess.PIPE, text=True
+            )
+            try:
+                saved = process.stdout.readline().strip().split(',')
+            finally:
+                # No shutdown flush, the snapshot must already be on disk
+                process.kill()
+                process.wait()
+                process.stdout.close()
+            self.assertEqual(len(saved), 19)
+
+            restored, volume = asyncio.run(self.restore(path))
+            self.assertEqual(restored, saved)
+            self.assertEqual(volume, 0.5)
+
+    async def restore(self, path):
+        db = Database(path)
+        try:
+            snapshots = QueueSnapshots(db, lambda guild_id: None)
+            queue, volume = await snapshots.restore(GUILD_ID)
+            # Only the first music command of a guild restores its queue
+            self.assertIsNone(await snapshots.restore(GUILD_ID))
+            return [track['title'] for track in queue], volume
+        finally:
+            await db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+# Codecs FFmpegOpusAudio copies into the Ogg/Opus stream without re-encoding
+PASSTHROUGH_CODECS = ('opus', 'libopus')
+
+# Containers ffmpeg can pull Opus packets out of for a straight remux
+OPUS_CONTAINERS = ('webm', 'ogg', 'opus', 'mka')
+
+
+def stream_codec(info):
+    """Audio codec of a resolved track, from yt-dlp metadata, or None if unknown"""
+    acodec = (info.get('acodec') or '').lower()
+    if not acodec or acodec == 'none':
+        return None
+    if acodec.startswith('opus'):
+        # Only trust it for containers we know how to remux
+        return 'opus' if (info.get('ext') or 'webm') in OPUS_CONTAINERS else None
+    return acodec.split('.')[0]
+
+
+def stream_bitrate(info, default=128):
+    """Audio bitrate in kbps from yt-dlp metadata"""
+    abr = info.get('abr')
+    try:
+        return max(1, min(512, int(round(float(abr))))) if abr else default
+    except (TypeError, ValueError):
+        return default
+
+
+def is_passthrough(codec):
+    """True if a stream with this codec can be sent without transcoding"""
+    return codec in PASSTHROUGH_CODECS
+
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+SETTING_KEY = 'command_tree_hash'
+
+
+def command_payload(command, tree):
+    """The JSON payload Discord receives for a command"""
+    try:
+        # discord.py 2.4+ needs the tree to resolve translations
+        return command.to_dict(tree)
+    except TypeError:
+        return command.to_dict()
+
+
+def tree_fingerprint(tree):
+    """Canonical hash of the global app command tree.
+
+    Covers everything sent on sync: names, descriptions, parameters,
+    choices, default permissions and context menus.
+    """
+    payload = sorted(
+        (command_payload(command, tree) for command in tree.get_commands()),
+        key=lambda data: (data.get('type', 1), data['name'])
+    )
+    canonical = json.dumps(
+        {'application_id': tree.client.application_id, 'commands': payload},
+        sort_keys=True,
+        separators=(',', ':'),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+async def sync_if_changed(tree, db, force=False):
+    """Sync the command tree only when its fingerprint changed, return True if synced"""
+    fingerprint = tree_fingerprint(tree)
+    stored = await db.get_bot_setting(SETTING_KEY)
+
+    if not force and stored == fingerprint:
+        logger.info('Slash commands unchanged, skipping sync')
+        return False
+
+    await tree.sync()
+    await db.set_bot_setting(SETTING_KEY, fingerprint)
+    logger.info('Slash commands synced!' + (' (forced)' if force else ''))
+    return True
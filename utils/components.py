@@ -0,0 +1,81 @@
+import logging
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+
+def detached(view):
+    """Stop a view so sending it only renders its components.
+
+    discord.py keeps every unfinished view it sends in memory to dispatch
+    its callbacks. Clicks on components sent this way go to the
+    ComponentRouter instead, which also handles them after a restart.
+    """
+    view.stop()
+    return view
+
+
+class ComponentRouter:
+    """Dispatches component interactions by custom_id.
+
+    A handler is registered once for a name and receives every click on a
+    component whose custom_id is either the name itself or starts with
+    the name and an underscore, along with the rest of the custom_id
+    ('poll_12_3' reaches the 'poll' handler with '12_3'). Lookup is a dict
+    access, so nothing is kept per message and the handlers work for
+    messages sent before a restart.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+
+        # Stats
+        self.dispatched = {}
+        self.unhandled = 0
+        self.errors = 0
+
+    def register(self, name, handler):
+        """Route custom_ids for name to handler(interaction, argument)"""
+        self._handlers[name] = handler
+
+    def unregister(self, name):
+        self._handlers.pop(name, None)
+
+    def resolve(self, custom_id):
+        """(name, handler, argument) for a custom_id, or three Nones"""
+        handler = self._handlers.get(custom_id)
+        if handler is not None:
+            return custom_id, handler, ''
+        name, _, argument = custom_id.partition('_')
+        handler = self._handlers.get(name)
+        if handler is not None:
+            return name, handler, argument
+        return None, None, None
+
+    async def dispatch(self, interaction: discord.Interaction):
+        """Run the handler for a component interaction, returns False if none matched"""
+        if interaction.type != discord.InteractionType.component:
+            return False
+        custom_id = (interaction.data or {}).get('custom_id', '')
+        name, handler, argument = self.resolve(custom_id)
+        if handler is None:
+            self.unhandled += 1
+            return False
+
+        self.dispatched[name] = self.dispatched.get(name, 0) + 1
+        try:
+            await handler(interaction, argument)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f'Component handler for {custom_id} failed: {e}')
+        return True
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'handlers': sorted(self._handlers),
+            'dispatched': dict(self.dispatched),
+            'unhandled': self.unhandled,
+            'errors': self.errors,
+        }
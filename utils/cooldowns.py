@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# (uses, per seconds) for each user, per command and guild
+DEFAULT_COOLDOWN = (5, 10.0)
+
+# Commands that cost more than a reply, used unless a guild sets its own limit
+COMMAND_COOLDOWNS = {
+    'mock': (2, 30.0),   # reads channel history
+    'play': (3, 10.0),   # song lookups
+    'poll': (2, 30.0),
+    'giveaway': (2, 60.0),
+    'suggest': (2, 60.0),
+}
+
+
+class CooldownStore:
+    """GCRA rate limiter keyed by (command, guild, user).
+
+    Each key holds one number, its theoretical arrival time, in a shared
+    array('d'), reached through nested dicts of command name, guild id and
+    user id so a check builds no key tuple. A use is allowed when it is no
+    earlier than the TAT minus the burst tolerance, and pushes the TAT one
+    emission interval (per / uses) further. Keys whose TAT has passed are
+    indistinguishable from new ones, so the periodic sweep drops them and
+    recycles their slots.
+    """
+
+    def __init__(self, sweep_interval=60.0):
+        self.sweep_interval = sweep_interval
+        self._keys = {}
+        self._tat = array('d')
+        self._free = []
+        self._size = 0
+        self._task = None
+        self._stopping = None
+
+        # Stats
+        self.checks = 0
+        self.limited = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return self._size
+
+    def hit(self, command, guild_id, user_id, uses, per, now=None):
+        """Record a use, returns 0.0 if it is allowed or the seconds to wait"""
+        self.checks += 1
+        if now is None:
+            now = time.monotonic()
+        interval = per / uses
+
+        guilds = self._keys.get(command)
+        if guilds is None:
+            guilds = self._keys[command] = {}
+        users = guilds.get(guild_id)
+        if users is None:
+            users = guilds[guild_id] = {}
+        slot = users.get(user_id)
+
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._tat)
+                self._tat.append(0.0)
+            users[user_id] = slot
+            self._size += 1
+            self._tat[slot] = now + interval
+            return 0.0
+
+        tat = self._tat[slot]
+        if tat < now:
+            tat = now
+        # Up to uses calls fit in a burst
+        wait = tat - now - (per - interval)
+        if wait > 0:
+            self.limited += 1
+            return wait
+        self._tat[slot] = tat + interval
+        return 0.0
+
+    def sweep(self, now=None):
+        """Drop keys that have fully recovered"""
+        if now is None:
+            now = time.monotonic()
+        tat = self._tat
+        for command, guilds in list(self._keys.items()):
+            for guild_id, users in list(guilds.items()):
+                expired = [user_id for user_id, slot in users.items() if tat[slot] <= now]
+                for user_id in expired:
+                    self._free.append(users.pop(user_id))
+                self._size -= len(expired)
+                self.evicted += len(expired)
+                if not users:
+                    del guilds[guild_id]
+            if not guilds:
+                del self._keys[command]
+
+    async def _sweep_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.sweep_interval)
+            except asyncio.TimeoutError:
+                self.sweep()
+
+    def start(self):
+        """Start the periodic sweep"""
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'keys': self._size,
+            'slots': len(self._tat),
+            'checks': self.checks,
+            'limited': self.limited,
+            'evicted': self.evicted,
+        }
+
+
+def cooldown_for(command, settings):
+    """(uses, per) for a command in a guild, or None when the guild turned cooldowns off
+
+    A guild can set either number, the other one stays the command's default.
+    """
+    uses, per = COMMAND_COOLDOWNS.get(command, DEFAULT_COOLDOWN)
+    if settings is None:
+        return uses, per
+    if settings.cooldown_uses is not None:
+        if settings.cooldown_uses <= 0:
+            return None
+        uses = settings.cooldown_uses
+    if settings.cooldown_seconds:
+        per = settings.cooldown_seconds
+    return uses, per
@@ -0,0 +1,443 @@
+import asyncio
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utils.settings_cache import GuildSettings, SettingsCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER PRIMARY KEY,
+    ticket_category_id INTEGER,
+    suggestion_channel_id INTEGER,
+    log_channel_id INTEGER,
+    welcome_channel_id INTEGER,
+    cooldown_uses INTEGER,
+    cooldown_seconds REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    xp INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_users_guild_xp ON users (guild_id, xp DESC);
+
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    topic TEXT,
+    status TEXT NOT NULL DEFAULT 'open',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    closed_at TIMESTAMP,
+    closed_by INTEGER,
+    closed_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status, guild_id, user_id);
+
+CREATE TABLE IF NOT EXISTS moderation_logs (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    moderator_id INTEGER NOT NULL,
+    target_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    reason TEXT,
+    duration TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_moderation_logs_guild ON moderation_logs (guild_id, created_at);
+
+CREATE TABLE IF NOT EXISTS warnings (
+    warning_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    moderator_id INTEGER NOT NULL,
+    reason TEXT,
+    expired INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_warnings_user ON warnings (guild_id, user_id, expired);
+
+CREATE TABLE IF NOT EXISTS giveaways (
+    giveaway_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    message_id INTEGER,
+    prize TEXT NOT NULL,
+    winners INTEGER NOT NULL DEFAULT 1,
+    ends_at TEXT NOT NULL,
+    ended INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_giveaways_pending ON giveaways (ended, giveaway_id);
+
+CREATE TABLE IF NOT EXISTS polls (
+    poll_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    message_id INTEGER,
+    question TEXT NOT NULL,
+    options TEXT NOT NULL,
+    author TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS poll_votes (
+    poll_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    option INTEGER NOT NULL,
+    PRIMARY KEY (poll_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS giveaway_entries (
+    giveaway_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (giveaway_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS bot_settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS music_queue_snapshots (
+    guild_id INTEGER PRIMARY KEY,
+    volume REAL NOT NULL DEFAULT 1.0,
+    tracks TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+'''
+
+
+# Columns added after a table was first released, created on existing databases at startup
+COLUMNS = (
+    ('guild_settings', 'cooldown_uses', 'INTEGER'),
+    ('guild_settings', 'cooldown_seconds', 'REAL'),
+)
+
+
+class Database:
+    """Async SQLite engine.
+
+    All writes go through a single writer thread fed by a queue, reads run
+    on a small pool of read-only connections, so a slow query never runs on
+    the event loop. The database is opened in WAL mode so readers are not
+    blocked by the writer.
+
+    The writer group-commits: pending writes are batched into one
+    transaction until either batch_size writes are collected or
+    batch_window seconds have passed since the first one arrived. Every
+    write runs in its own savepoint, so a failing statement only fails its
+    own caller, and each caller is resolved with its own result once the
+    shared transaction has committed.
+    """
+
+    def __init__(self, path=None, read_connections=4, cached_statements=256,
+                 batch_size=256, batch_window=0.002):
+        self.path = str(path or os.getenv('DB_PATH', './data/bot.db'))
+        self.cached_statements = cached_statements
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.commits = 0
+        self.committed_writes = 0
+        self.settings_cache = SettingsCache()
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+        # Writer thread
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+        self._writer.start()
+
+        # Read pool, one read-only connection per worker thread
+        self._local = threading.local()
+        self._read_connections = []
+        self._read_lock = threading.Lock()
+        self._reader = ThreadPoolExecutor(max_workers=read_connections, thread_name_prefix='db-reader')
+        self._closed = False
+
+    def _connect(self, readonly=False):
+        """Open a connection with the shared pragmas"""
+        if readonly:
+            conn = sqlite3.connect(
+                f'file:{Path(self.path).resolve().as_posix()}?mode=ro',
+                uri=True,
+                check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+            conn.execute('PRAGMA query_only = ON')
+        else:
+            conn = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=self.cached_statements
+            )
+            # Group commit amortises the fsync, so every commit can be durable
+            conn.execute('PRAGMA synchronous = FULL')
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout = 5000')
+        return conn
+
+    def _init_schema(self):
+        """Create tables and switch the database to WAL mode"""
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.executescript(SCHEMA)
+            for table, column, column_type in COLUMNS:
+                existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+        finally:
+            conn.close()
+
+    # Writer side
+
+    def _writer_loop(self):
+        conn = self._connect()
+        try:
+            running = True
+            while running:
+                job = self._write_queue.get()
+                if job is None:
+                    break
+                batch = [job]
+
+                # Collect more writes until the batch is full or the window closes
+                deadline = time.monotonic() + self.batch_window
+                while len(batch) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        job = self._write_queue.get(timeout=timeout) if timeout > 0 else self._write_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        running = False
+                        break
+                    batch.append(job)
+
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        """Run a batch of writes in one transaction, one savepoint per write"""
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for func, loop, future in batch:
+                conn.execute('SAVEPOINT write')
+                try:
+                    result = func(conn)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write')
+                    results.append((None, e))
+                else:
+                    results.append((result, None))
+                conn.execute('RELEASE write')
+            conn.execute('COMMIT')
+        except Exception as e:
+            # The transaction itself failed, nothing in the batch is durable
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            logger.error(f'Database batch of {len(batch)} writes failed: {e}')
+            results = [(None, e)] * len(batch)
+        else:
+            self.commits += 1
+            self.committed_writes += len(batch)
+
+        for (func, loop, future), (result, error) in zip(batch, results):
+            self._resolve(loop, future, result=result, error=error)
+
+    @staticmethod
+    def _resolve(loop, future, result=None, error=None):
+        def resolve():
+            if future.cancelled():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        try:
+            loop.call_soon_threadsafe(resolve)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    async def run_write(self, func):
+        """Run func(conn) on the writer thread and wait until it is committed"""
+        if self._closed:
+            raise RuntimeError('Database is closed')
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._write_queue.put((func, loop, future))
+        return await future
+
+    # Reader side
+
+    def _read_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect(readonly=True)
+            self._local.conn = conn
+            with self._read_lock:
+                self._read_connections.append(conn)
+        return conn
+
+    async def run_read(self, func):
+        """Run func(conn) on a pooled read-only connection"""
+        if self._closed:
+            raise RuntimeError('Database is closed')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader, lambda: func(self._read_connection()))
+
+    # Query helpers
+
+    async def execute(self, query, params=()):
+        """Execute a write statement and return the last row id"""
+        return await self.run_write(lambda conn: conn.execute(query, params).lastrowid)
+
+    async def executemany(self, query, seq_of_params):
+        """Execute a write statement for every parameter set and return the row count"""
+        seq_of_params = list(seq_of_params)
+        return await self.run_write(lambda conn: conn.executemany(query, seq_of_params).rowcount)
+
+    async def fetchone(self, query, params=()):
+        """Fetch a single row"""
+        return await self.run_read(lambda conn: conn.execute(query, params).fetchone())
+
+    async def fetchall(self, query, params=()):
+        """Fetch all rows"""
+        return await self.run_read(lambda conn: conn.execute(query, params).fetchall())
+
+    # Guild settings
+
+    async def get_guild_settings(self, guild_id):
+        """Get settings for a guild, served from the settings cache when possible"""
+        settings = self.settings_cache.get(guild_id)
+        if settings is not MISSING:
+            return settings
+
+        version = self.settings_cache.version
+        row = await self.fetchone('SELECT * FROM guild_settings WHERE guild_id = ?', (guild_id,))
+        settings = GuildSettings.from_row(row) if row else None
+        self.settings_cache.put(guild_id, settings, version)
+        return settings
+
+    async def update_guild_settings(self, guild_id, **settings):
+        """Insert or update settings for a guild"""
+        if not settings:
+            return
+        columns = ', '.join(settings)
+        placeholders = ', '.join('?' for _ in settings)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in settings)
+        await self.execute(f'''
+            INSERT INTO guild_settings (guild_id, {columns}) VALUES (?, {placeholders})
+            ON CONFLICT (guild_id) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP
+        ''', (guild_id, *settings.values()))
+        self.settings_cache.invalidate(guild_id)
+
+    # Tickets
+
+    async def create_ticket(self, guild_id, user_id, channel_id, topic):
+        """Create a ticket and return its id"""
+        return await self.execute('''
+            INSERT INTO tickets (guild_id, user_id, channel_id, topic)
+            VALUES (?, ?, ?, ?)
+        ''', (guild_id, user_id, channel_id, topic))
+
+    async def get_open_tickets(self):
+        """Get all open tickets"""
+        rows = await self.fetchall('''
+            SELECT * FROM tickets WHERE status = 'open' ORDER BY created_at DESC
+        ''')
+        return [dict(row) for row in rows]
+
+    # Moderation
+
+    async def add_moderation_log(self, guild_id, moderator_id, target_id, action, reason, duration):
+        """Record a moderation action"""
+        return await self.execute('''
+            INSERT INTO moderation_logs (guild_id, moderator_id, target_id, action, reason, duration)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (guild_id, moderator_id, target_id, action, reason, duration))
+
+    async def add_warning(self, guild_id, user_id, moderator_id, reason):
+        """Add a warning and return the user's active warning count"""
+        def write(conn):
+            conn.execute('''
+                INSERT INTO warnings (guild_id, user_id, moderator_id, reason)
+                VALUES (?, ?, ?, ?)
+            ''', (guild_id, user_id, moderator_id, reason))
+            return conn.execute('''
+                SELECT COUNT(*) FROM warnings
+                WHERE guild_id = ? AND user_id = ? AND expired = 0
+            ''', (guild_id, user_id)).fetchone()[0]
+        return await self.run_write(write)
+
+    async def get_moderation_logs(self, limit=100):
+        """Get the most recent moderation logs"""
+        rows = await self.fetchall('''
+            SELECT * FROM moderation_logs ORDER BY log_id DESC LIMIT ?
+        ''', (limit,))
+        return [dict(row) for row in rows]
+
+    # Dashboard
+
+    async def get_bot_stats(self):
+        """Get aggregate stats for the dashboard"""
+        def query(conn):
+            return {
+                'open_tickets': conn.execute("SELECT COUNT(*) FROM tickets WHERE status = 'open'").fetchone()[0],
+                'active_warnings': conn.execute('SELECT COUNT(*) FROM warnings WHERE expired = 0').fetchone()[0],
+                'moderation_actions': conn.execute('SELECT COUNT(*) FROM moderation_logs').fetchone()[0],
+                'users': conn.execute('SELECT COUNT(*) FROM users').fetchone()[0],
+            }
+        return await self.run_read(query)
+
+    async def get_bot_settings(self):
+        """Get global bot settings"""
+        rows = await self.fetchall('SELECT key, value FROM bot_settings')
+        return {row['key']: row['value'] for row in rows}
+
+    async def get_bot_setting(self, key, default=None):
+        """Get a single global bot setting"""
+        row = await self.fetchone('SELECT value FROM bot_settings WHERE key = ?', (key,))
+        return row['value'] if row else default
+
+    async def set_bot_setting(self, key, value):
+        """Set a global bot setting"""
+        await self.execute('''
+            INSERT INTO bot_settings (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+
+    async def close(self):
+        """Drain pending writes and close all connections"""
+        if self._closed:
+            return
+        self._closed = True
+        self._write_queue.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self._writer.join)
+        self._reader.shutdown(wait=True)
+        with self._read_lock:
+            for conn in self._read_connections:
+                conn.close()
+            self._read_connections.clear()
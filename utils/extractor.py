@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Only the fields the Music cog uses are sent back from the worker process
+TRACK_FIELDS = ('id', 'title', 'webpage_url', 'url', 'duration', 'thumbnail', 'acodec', 'abr', 'ext')
+
+
+def extract_track(query, ydl_opts):
+    """Resolve a query with yt-dlp, runs inside a worker process"""
+    import yt_dlp
+    yt_dlp.utils.bug_reports_message = lambda: ''
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(query, download=False)
+
+    if info and 'entries' in info:
+        entries = [entry for entry in info['entries'] if entry]
+        if not entries:
+            raise LookupError(f'No results for {query}')
+        info = entries[0]
+
+    return {field: info.get(field) for field in TRACK_FIELDS}
+
+
+def extract_playlist_page(url, ydl_opts, start, end):
+    """Flat-extract entries start to end (1-based, inclusive) of a playlist, runs inside a worker process
+
+    Entries are listed without resolving their streams, and yt-dlp only
+    fetches the playlist pages it needs to reach end.
+    """
+    import yt_dlp
+    yt_dlp.utils.bug_reports_message = lambda: ''
+
+    opts = dict(ydl_opts, extract_flat='in_playlist', noplaylist=False, playliststart=start, playlistend=end)
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    listed = list(info.get('entries') or [])
+    entries = []
+    for entry in listed:
+        # Unavailable and private videos come back without a URL
+        if not entry or not entry.get('url'):
+            continue
+        thumbnails = entry.get('thumbnails') or [{}]
+        entries.append({
+            'id': entry.get('id'),
+            'title': entry.get('title'),
+            'webpage_url': entry.get('webpage_url') or entry['url'],
+            'duration': entry.get('duration'),
+            'thumbnail': entry.get('thumbnail') or thumbnails[-1].get('url'),
+        })
+    return {'title': info.get('title'), 'count': info.get('playlist_count'), 'listed': len(listed), 'entries': entries}
+
+
+def playlist_has_more(page, start, end):
+    """Whether a playlist has entries after a page listed from start to end"""
+    if page.get('count'):
+        return page['count'] > end
+    # Without a total, a full page means there may be more
+    return page['listed'] > end - start
+
+
+def is_playlist_url(query):
+    """True for playlist links; a video link that also names a playlist plays just the video"""
+    if not query.startswith(('http://', 'https://')):
+        return False
+    parsed = urlparse(query)
+    params = parse_qs(parsed.query)
+    if 'list' in params and 'v' not in params:
+        return True
+    return parsed.path.rstrip('/').endswith('/playlist') or '/sets/' in parsed.path
+
+
+class ExtractionError(Exception):
+    pass
+
+
+class ExtractionPool:
+    """Runs yt-dlp extraction in a bounded process pool.
+
+    extract_info blocks for seconds at a time, so it never runs on the
+    event loop. At most max_workers extractions run at once and each guild
+    can hold at most per_guild of those slots, so one guild queueing a
+    burst of songs can't starve everyone else. Waiting callers are served
+    in arrival order, and a call is dropped with ExtractionError once its
+    timeout or deadline passes. A job that already started in a worker
+    can't be stopped, so it keeps its slots until it actually finishes.
+    """
+
+    def __init__(self, ydl_opts, max_workers=2, per_guild=1, timeout=30.0, extract_func=extract_track,
+                 playlist_func=extract_playlist_page):
+        self.ydl_opts = ydl_opts
+        self.max_workers = max_workers
+        self.per_guild = per_guild
+        self.timeout = timeout
+        self.extract_func = extract_func
+        self.playlist_func = playlist_func
+
+        self._executor = None
+        self._slots = asyncio.Semaphore(max_workers)
+        self._guild_slots = {}
+        self._guild_pending = {}
+        self._guild_jobs = {}
+
+        # Stats
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Spawn rather than fork, the bot process already runs threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def queue_depth(self, guild_id=None):
+        """Extractions waiting or running, overall or for one guild"""
+        if guild_id is None:
+            return self.pending
+        return self._guild_pending.get(guild_id, 0)
+
+    async def extract(self, guild_id, query, deadline=None):
+        """Resolve a query to track info.
+
+        deadline is a time.time() timestamp after which the result is no
+        longer useful, e.g. when the interaction token expires.
+        """
+        return await self._submit(guild_id, deadline, self.extract_func, query, self.ydl_opts)
+
+    async def extract_playlist(self, guild_id, url, start, end, deadline=None):
+        """List entries start to end (1-based, inclusive) of a playlist"""
+        return await self._submit(guild_id, deadline, self.playlist_func, url, self.ydl_opts, start, end)
+
+    async def _submit(self, guild_id, deadline, func, *args):
+        timeout = self.timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time())
+        if timeout <= 0:
+            raise ExtractionError('Request expired before extraction started')
+
+        guild_slots = self._guild_slots.get(guild_id)
+        if guild_slots is None:
+            guild_slots = self._guild_slots[guild_id] = asyncio.Semaphore(self.per_guild)
+
+        self.pending += 1
+        self._guild_pending[guild_id] = self._guild_pending.get(guild_id, 0) + 1
+        try:
+            return await asyncio.wait_for(self._run(guild_id, guild_slots, func, args), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise ExtractionError('Timed out looking up the song') from None
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.pending -= 1
+            remaining = self._guild_pending[guild_id] - 1
+            if remaining:
+                self._guild_pending[guild_id] = remaining
+            else:
+                del self._guild_pending[guild_id]
+                self._forget_guild(guild_id)
+
+    def _forget_guild(self, guild_id):
+        """Drop a guild's semaphore once nothing waits on or holds it"""
+        if guild_id not in self._guild_pending and not self._guild_jobs.get(guild_id):
+            self._guild_jobs.pop(guild_id, None)
+            self._guild_slots.pop(guild_id, None)
+
+    async def _run(self, guild_id, guild_slots, func, args):
+        await guild_slots.acquire()
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            guild_slots.release()
+            raise
+
+        # The job holds both slots until it is done, even if the caller stops waiting
+        self._guild_jobs[guild_id] = self._guild_jobs.get(guild_id, 0) + 1
+        self.running += 1
+        loop = asyncio.get_running_loop()
+        try:
+            job = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._job_done(guild_id, guild_slots)
+            raise
+        job.add_done_callback(lambda _: self._call_soon(loop, self._job_done, guild_id, guild_slots))
+
+        # Cancelling this future drops the job if it hasn't started yet
+        result = await asyncio.wrap_future(job)
+        self.completed += 1
+        return result
+
+    def _job_done(self, guild_id, guild_slots):
+        self.running -= 1
+        self._slots.release()
+        guild_slots.release()
+        self._guild_jobs[guild_id] -= 1
+        self._forget_guild(guild_id)
+
+    @staticmethod
+    def _call_soon(loop, callback, *args):
+        """Run callback on the event loop from a pool thread"""
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The loop closed while a job was still running
+            pass
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'pending': self.pending,
+            'running': self.running,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'cancelled': self.cancelled,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
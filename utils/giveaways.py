@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+def sample_entries(conn, giveaway_id, k, rng=random):
+    """Pick k entrants of a giveaway uniformly, returns (user_ids, entry_count).
+
+    The positions to keep are chosen up front and each one is reached
+    with OFFSET from the previous pick, so the entries are scanned once by
+    SQLite and only the picked user ids come back to Python.
+    """
+    count = conn.execute(
+        'SELECT COUNT(*) FROM giveaway_entries WHERE giveaway_id = ?', (giveaway_id,)
+    ).fetchone()[0]
+    picked = []
+    last_user = -1
+    position = -1
+    for wanted in sorted(rng.sample(range(count), max(0, min(k, count)))):
+        row = conn.execute('''
+            SELECT user_id FROM giveaway_entries
+            WHERE giveaway_id = ? AND user_id > ?
+            ORDER BY user_id
+            LIMIT 1 OFFSET ?
+        ''', (giveaway_id, last_user, wanted - position - 1)).fetchone()
+        if row is None:
+            break
+        last_user = row[0]
+        position = wanted
+        picked.append(last_user)
+    rng.shuffle(picked)
+    return picked, count
+
+
+class GiveawayEntries:
+    """Giveaway entry recorder.
+
+    Clicks on a giveaway's enter button are deduplicated in memory with a
+    set of user ids per giveaway and written to the giveaway_entries table
+    in batched INSERT OR IGNORE statements, on a timer or as soon as
+    max_pending entries are waiting, instead of one write per click. The
+    table's primary key keeps entries unique across restarts, when the
+    in-memory sets start out empty.
+
+    Winners are sampled from the stored entries on a read connection
+    without loading them, so a giveaway with a million entries never has
+    them all in a list.
+    """
+
+    def __init__(self, db, flush_interval=1.0, max_pending=5000, flush_chunk=5000):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.flush_chunk = flush_chunk
+
+        self._entered = {}
+        self._pending = []
+
+        self._task = None
+        self._stopping = None
+        self._flush_lock = asyncio.Lock()
+
+        # Stats
+        self.entries = 0
+        self.duplicates = 0
+        self.flushes = 0
+
+    def add(self, giveaway_id, user_id):
+        """Record an entry, returns False if the user had already entered"""
+        entered = self._entered.get(giveaway_id)
+        if entered is None:
+            entered = self._entered[giveaway_id] = set()
+        if user_id in entered:
+            self.duplicates += 1
+            return False
+
+        entered.add(user_id)
+        self._pending.append((giveaway_id, user_id))
+        self.entries += 1
+        if len(self._pending) >= self.max_pending and not self._flush_lock.locked():
+            asyncio.ensure_future(self.flush())
+        return True
+
+    async def flush(self):
+        """Write all pending entries in batched inserts"""
+        async with self._flush_lock:
+            rows, self._pending = self._pending, []
+            # Write in chunks so other writes can interleave with a click storm
+            for start in range(0, len(rows), self.flush_chunk):
+                try:
+                    await self.db.executemany(
+                        'INSERT OR IGNORE INTO giveaway_entries (giveaway_id, user_id) VALUES (?, ?)',
+                        rows[start:start + self.flush_chunk]
+                    )
+                except Exception as e:
+                    logger.error(f'Failed to flush {len(rows) - start} giveaway entries: {e}')
+                    # Retry with the next flush
+                    self._pending[:0] = rows[start:]
+                    return start
+                self.flushes += 1
+            return len(rows)
+
+    async def draw(self, giveaway_id, winners):
+        """Pick a giveaway's winners, returns (user_ids, entry_count)"""
+        self._entered.pop(giveaway_id, None)
+        await self.flush()
+
+        def sample(conn):
+            # One read transaction so the count matches the entries sampled
+            conn.execute('BEGIN')
+            try:
+                return sample_entries(conn, giveaway_id, winners)
+            finally:
+                conn.execute('COMMIT')
+
+        return await self.db.run_read(sample)
+
+    async def _flush_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self):
+        """Start the periodic flush"""
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the periodic flush and write out everything still pending"""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'open_giveaways': len(self._entered),
+            'pending': len(self._pending),
+            'entries': self.entries,
+            'duplicates': self.duplicates,
+            'flushes': self.flushes,
+        }
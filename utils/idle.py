@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def session_idle_reason(listeners, busy, queued):
+    """Why a voice session is idle, or None while it is in use.
+
+    'empty' when nobody but bots is listening, 'idle' when nothing is
+    playing, paused or starting and the queue is empty. A paused session
+    with songs left is in use: releasing it would drop its queue.
+    """
+    if not listeners:
+        return 'empty'
+    if not busy and not queued:
+        return 'idle'
+    return None
+
+
+class IdleReaper:
+    """Disconnects voice sessions that have been idle for too long.
+
+    Every interval seconds check(guild_id) is asked why each guild in
+    guilds() is idle: it returns a reason such as 'empty' or 'idle', or
+    None while the session is in use. A guild that has stayed idle for
+    the same reason longer than that reason's grace period is passed to
+    release(guild_id, reason), which tears its state down.
+    """
+
+    def __init__(self, guilds, check, release, timeouts, interval=15):
+        self.guilds = guilds
+        self.check = check
+        self.release = release
+        self.timeouts = timeouts
+        self.interval = interval
+        self._idle = {}
+        self._task = None
+        self._stopping = None
+
+        # Stats
+        self.reaped = {reason: 0 for reason in timeouts}
+        self.recent = deque(maxlen=20)
+
+    async def sweep(self, now=None):
+        """Release every guild that is past its grace period"""
+        if now is None:
+            now = time.monotonic()
+        for guild_id in list(self.guilds()):
+            reason = self.check(guild_id)
+            if reason is None:
+                self._idle.pop(guild_id, None)
+                continue
+
+            entry = self._idle.get(guild_id)
+            if entry is None or entry[0] != reason:
+                self._idle[guild_id] = (reason, now)
+                continue
+            if now - entry[1] < self.timeouts.get(reason, 0):
+                continue
+
+            self._idle.pop(guild_id, None)
+            try:
+                await self.release(guild_id, reason)
+            except Exception as e:
+                logger.error(f'Failed to release idle guild {guild_id}: {e}')
+                continue
+            self.record(guild_id, reason)
+
+        # Forget guilds that went away some other way
+        for guild_id in set(self._idle) - set(self.guilds()):
+            del self._idle[guild_id]
+
+    def record(self, guild_id, reason):
+        """Count a released session, also for releases that happen outside a sweep"""
+        self.reaped[reason] = self.reaped.get(reason, 0) + 1
+        self.recent.append({'guild_id': guild_id, 'reason': reason, 'at': time.time()})
+        logger.info(f'Released voice session in guild {guild_id} ({reason})')
+
+    def forget(self, guild_id):
+        self._idle.pop(guild_id, None)
+
+    def idle_for(self, guild_id, now=None):
+        """(reason, seconds) a guild has been idle, or None"""
+        entry = self._idle.get(guild_id)
+        if entry is None:
+            return None
+        return entry[0], (now or time.monotonic()) - entry[1]
+
+    async def _sweep_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                await self.sweep()
+
+    def start(self):
+        """Start the periodic sweep"""
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'idle_guilds': len(self._idle),
+            'reaped': dict(self.reaped),
+            'recent': list(self.recent),
+        }
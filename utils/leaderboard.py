@@ -0,0 +1,272 @@
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Keys pack (-xp, user_id) into one int so they sort by XP descending,
+# then by user id, and cost a single int object per member.
+_XP_CAP = 1 << 62
+_ID_BITS = 64
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def _encode(user_id, xp):
+    return ((_XP_CAP - xp) << _ID_BITS) | user_id
+
+
+def _decode(key):
+    return key & _ID_MASK, _XP_CAP - (key >> _ID_BITS)
+
+
+class RankIndex:
+    """Order-statistics index over one guild's XP.
+
+    Keys are kept in sorted buckets of at most 2 * load entries, with a
+    Fenwick tree over the bucket sizes, so updates, rank lookups and
+    positional access all cost O(log n) bucket work plus a short memmove.
+    """
+
+    def __init__(self, load=512):
+        self._load = load
+        self._buckets = []
+        self._maxes = []
+        self._tree = []
+        self._tree_dirty = False
+        self._xp = {}
+
+    def __len__(self):
+        return len(self._xp)
+
+    def __contains__(self, user_id):
+        return user_id in self._xp
+
+    def get_xp(self, user_id):
+        return self._xp.get(user_id)
+
+    # Fenwick tree over bucket sizes
+
+    def _build_tree(self):
+        tree = [len(bucket) for bucket in self._buckets]
+        for i in range(len(tree)):
+            parent = i | (i + 1)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._tree_dirty = False
+
+    def _tree_add(self, pos, delta):
+        if self._tree_dirty:
+            return
+        tree = self._tree
+        while pos < len(tree):
+            tree[pos] += delta
+            pos |= pos + 1
+
+    def _prefix(self, pos):
+        """Number of keys in buckets before pos"""
+        if self._tree_dirty:
+            self._build_tree()
+        tree = self._tree
+        total = 0
+        while pos > 0:
+            total += tree[pos - 1]
+            pos &= pos - 1
+        return total
+
+    def _locate(self, index):
+        """Bucket and offset of the key at a 0-based position"""
+        if self._tree_dirty:
+            self._build_tree()
+        tree = self._tree
+        pos = 0
+        step = 1 << (len(tree).bit_length() - 1) if tree else 0
+        while step:
+            nxt = pos + step
+            if nxt <= len(tree) and tree[nxt - 1] <= index:
+                index -= tree[nxt - 1]
+                pos = nxt
+            step >>= 1
+        return pos, index
+
+    # Mutation
+
+    def _insert(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._tree_dirty = True
+            return
+
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._buckets[pos].append(key)
+            self._maxes[pos] = key
+        else:
+            insort(self._buckets[pos], key)
+
+        bucket = self._buckets[pos]
+        if len(bucket) > 2 * self._load:
+            # Split an oversized bucket in half
+            half = bucket[self._load:]
+            del bucket[self._load:]
+            self._maxes[pos] = bucket[-1]
+            self._buckets.insert(pos + 1, half)
+            self._maxes.insert(pos + 1, half[-1])
+            self._tree_dirty = True
+        else:
+            self._tree_add(pos, 1)
+
+    def _remove(self, key):
+        pos = bisect_left(self._maxes, key)
+        bucket = self._buckets[pos]
+        del bucket[bisect_left(bucket, key)]
+
+        if not bucket:
+            del self._buckets[pos]
+            del self._maxes[pos]
+            self._tree_dirty = True
+        else:
+            self._maxes[pos] = bucket[-1]
+            self._tree_add(pos, -1)
+
+    def update(self, user_id, xp):
+        """Set a member's XP"""
+        old = self._xp.get(user_id)
+        if old == xp:
+            return
+        if old is not None:
+            self._remove(_encode(user_id, old))
+        self._xp[user_id] = xp
+        self._insert(_encode(user_id, xp))
+
+    def add(self, user_id, gained):
+        """Add XP to a member"""
+        self.update(user_id, self._xp.get(user_id, 0) + gained)
+
+    def discard(self, user_id):
+        """Remove a member"""
+        old = self._xp.pop(user_id, None)
+        if old is not None:
+            self._remove(_encode(user_id, old))
+
+    def bulk_load(self, rows):
+        """Replace the contents with (user_id, xp) rows"""
+        self._xp = dict(rows)
+        keys = sorted(_encode(user_id, xp) for user_id, xp in self._xp.items())
+        self._buckets = [keys[i:i + self._load] for i in range(0, len(keys), self._load)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._tree_dirty = True
+
+    # Queries
+
+    def rank(self, user_id):
+        """1-based rank of a member, or None if they have no XP"""
+        xp = self._xp.get(user_id)
+        if xp is None:
+            return None
+        key = _encode(user_id, xp)
+        pos = bisect_left(self._maxes, key)
+        return self._prefix(pos) + bisect_left(self._buckets[pos], key) + 1
+
+    def slice(self, start, count):
+        """(rank, user_id, xp) rows for ranks start + 1 .. start + count"""
+        if start < 0:
+            count += start
+            start = 0
+        if count <= 0 or start >= len(self._xp):
+            return []
+
+        rows = []
+        pos, offset = self._locate(start)
+        rank = start + 1
+        while pos < len(self._buckets) and len(rows) < count:
+            for key in self._buckets[pos][offset:offset + count - len(rows)]:
+                user_id, xp = _decode(key)
+                rows.append((rank, user_id, xp))
+                rank += 1
+            pos += 1
+            offset = 0
+        return rows
+
+    def top(self, count=10, page=1):
+        """A page of the leaderboard"""
+        return self.slice((page - 1) * count, count)
+
+    def around(self, user_id, radius=2):
+        """Rows for the members ranked just above and below a member"""
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        return self.slice(rank - 1 - radius, 2 * radius + 1)
+
+
+class Leaderboards:
+    """Per-guild rank indexes, loaded lazily from the users table.
+
+    At most max_guilds indexes are kept, least recently used first out.
+    XP flushed by the XP engine is applied to loaded indexes through
+    apply(), so the database is only scanned once per guild.
+    """
+
+    def __init__(self, db, max_guilds=256):
+        self.db = db
+        self.max_guilds = max_guilds
+        self._indexes = OrderedDict()
+        self._loading = {}
+        self._stale = set()
+
+    async def get(self, guild_id):
+        """Get a guild's rank index, loading it on first use"""
+        index = self._indexes.get(guild_id)
+        if index is not None:
+            self._indexes.move_to_end(guild_id)
+            return index
+
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(guild_id))
+            self._loading[guild_id] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, guild_id):
+        try:
+            # Build the index on the read pool, big guilds take a while to sort
+            def build(conn):
+                index = RankIndex()
+                index.bulk_load(conn.execute(
+                    'SELECT user_id, xp FROM users WHERE guild_id = ?', (guild_id,)
+                ))
+                return index
+
+            index = await self.db.run_read(build)
+
+            # XP flushed while loading may be missing from the rows, keep
+            # serving this copy but load again next time
+            if guild_id in self._stale:
+                self._stale.discard(guild_id)
+                return index
+
+            self._indexes[guild_id] = index
+            while len(self._indexes) > self.max_guilds:
+                self._indexes.popitem(last=False)
+            return index
+        finally:
+            del self._loading[guild_id]
+
+    def apply(self, rows):
+        """Apply flushed (guild_id, user_id, gained_xp) rows to loaded indexes"""
+        for guild_id, user_id, gained in rows:
+            index = self._indexes.get(guild_id)
+            if index is not None:
+                index.add(user_id, gained)
+            elif guild_id in self._loading:
+                self._stale.add(guild_id)
+
+    def invalidate(self, guild_id):
+        """Drop a guild's index so it is reloaded on next use"""
+        self._indexes.pop(guild_id, None)
+        if guild_id in self._loading:
+            self._stale.add(guild_id)
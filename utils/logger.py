@@ -10,12 +10,15 @@ def setup_logger(name=__name__):
     logs_dir = Path('./logs')
     logs_dir.mkdir(exist_ok=True)
     
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    # Handlers go on the root logger so module loggers (utils.*, cogs.*, web_ui) reach them too
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG)
     
     # Remove existing handlers
-    logger.handlers.clear()
+    root.handlers.clear()
+    
+    # discord.py logs every gateway event at debug level
+    logging.getLogger('discord').setLevel(logging.INFO)
     
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
@@ -51,8 +54,8 @@ def setup_logger(name=__name__):
     error_handler.setFormatter(error_format)
     
     # Add handlers
-    logger.addHandler(console_handler)
-    logger.addHandler(debug_handler)
-    logger.addHandler(error_handler)
+    root.addHandler(console_handler)
+    root.addHandler(debug_handler)
+    root.addHandler(error_handler)
     
-    return logger
+    return logging.getLogger(name)
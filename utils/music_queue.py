@@ -0,0 +1,284 @@
+import random
+import sys
+from itertools import islice
+
+# Fields a track carries, in the order the Music cog builds them
+TRACK_FIELDS = (
+    'id', 'title', 'url', 'audio_url', 'duration', 'codec', 'bitrate',
+    'requester', 'requester_id', 'thumbnail', 'prepared',
+)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Track:
+    """A queued song.
+
+    Uses __slots__ rather than a dict per song, and interns the strings
+    that repeat across queues (titles, page URLs, thumbnails, requester
+    names), so the same track queued in many guilds shares them. Supports
+    song['key'] and song.get('key') so it can be used where song dicts
+    were.
+    """
+
+    __slots__ = TRACK_FIELDS
+
+    def __init__(self, video_id=None, title='Unknown Title', url=None, audio_url=None, duration=0,
+                 codec=None, bitrate=None, requester=None, requester_id=None, thumbnail=None):
+        self.id = _intern(video_id)
+        self.title = _intern(title)
+        self.url = _intern(url)
+        # Stream URLs are unique per lookup, nothing to share
+        self.audio_url = audio_url
+        self.duration = duration
+        self.codec = _intern(codec)
+        self.bitrate = bitrate
+        self.requester = _intern(requester)
+        self.requester_id = requester_id
+        self.thumbnail = _intern(thumbnail)
+        self.prepared = False
+
+    def __getitem__(self, key):
+        if key not in TRACK_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in TRACK_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in TRACK_FIELDS else default
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in TRACK_FIELDS}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MusicQueue:
+    """A guild's song queue.
+
+    Tracks are stored in chunks of at most 2 * load entries with a Fenwick
+    tree over the chunk sizes, so finding, removing, inserting or moving a
+    track by position costs O(log n) plus a shift within one chunk instead
+    of the whole queue, and a page is read without walking the queue from
+    the start. The queue holds at most max_size tracks and at most
+    per_user tracks from any one requester.
+    """
+
+    def __init__(self, max_size=1000, per_user=100, load=256):
+        self.max_size = max_size
+        self.per_user = per_user
+        self._load = load
+        self._chunks = []
+        self._tree = []
+        self._tree_dirty = False
+        self._len = 0
+        self._user_counts = {}
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len > 0
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield from chunk
+
+    def __getitem__(self, index):
+        chunk, pos = self._locate(index)
+        return self._chunks[chunk][pos]
+
+    # Fenwick tree over chunk sizes
+
+    def _build_tree(self):
+        tree = [len(chunk) for chunk in self._chunks]
+        for i in range(len(tree)):
+            parent = i | (i + 1)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._tree_dirty = False
+
+    def _tree_add(self, pos, delta):
+        if self._tree_dirty:
+            return
+        tree = self._tree
+        while pos < len(tree):
+            tree[pos] += delta
+            pos |= pos + 1
+
+    def _locate(self, index):
+        """Chunk and offset of the track at a 0-based position"""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('queue index out of range')
+        if index < len(self._chunks[0]):
+            return 0, index
+        if self._tree_dirty:
+            self._build_tree()
+        tree = self._tree
+        pos = 0
+        step = 1 << (len(tree).bit_length() - 1)
+        while step:
+            nxt = pos + step
+            if nxt <= len(tree) and tree[nxt - 1] <= index:
+                index -= tree[nxt - 1]
+                pos = nxt
+            step >>= 1
+        return pos, index
+
+    # Limits
+
+    def _count_user(self, track, delta):
+        user_id = track.requester_id
+        count = self._user_counts.get(user_id, 0) + delta
+        if count:
+            self._user_counts[user_id] = count
+        else:
+            self._user_counts.pop(user_id, None)
+
+    def user_count(self, user_id):
+        """Number of queued tracks requested by a user"""
+        return self._user_counts.get(user_id, 0)
+
+    def check(self, user_id, count=1):
+        """Raise QueueFull if a user can't add count more tracks"""
+        if self._len + count > self.max_size:
+            raise QueueFull(f'The queue is full ({self.max_size} songs)')
+        if self.user_count(user_id) + count > self.per_user:
+            raise QueueFull(f'You already have {self.user_count(user_id)} songs queued (limit {self.per_user})')
+
+    # Mutation
+
+    def append(self, track):
+        """Add a track to the end of the queue, returns its position (1-based)"""
+        self.check(track.requester_id)
+        self._insert(self._len, track)
+        self._count_user(track, 1)
+        return self._len
+
+    def extend(self, tracks):
+        """Append a batch of tracks, returns how many fit under the limits"""
+        added = 0
+        for track in tracks:
+            try:
+                self.append(track)
+            except QueueFull:
+                break
+            added += 1
+        return added
+
+    def room(self, user_id):
+        """How many more tracks a user can add"""
+        return max(0, min(self.max_size - self._len, self.per_user - self.user_count(user_id)))
+
+    def insert(self, index, track):
+        """Insert a track before the given index"""
+        self.check(track.requester_id)
+        self._insert(index, track)
+        self._count_user(track, 1)
+
+    def _insert(self, index, track):
+        if index >= self._len:
+            if not self._chunks or len(self._chunks[-1]) >= self._load:
+                self._chunks.append([track])
+                self._tree_dirty = True
+            else:
+                self._chunks[-1].append(track)
+                self._tree_add(len(self._chunks) - 1, 1)
+            self._len += 1
+            return
+
+        i, pos = self._locate(max(index, 0))
+        chunk = self._chunks[i]
+        chunk.insert(pos, track)
+        self._len += 1
+        if len(chunk) > 2 * self._load:
+            # Split an oversized chunk in half
+            self._chunks.insert(i + 1, chunk[self._load:])
+            del chunk[self._load:]
+            self._tree_dirty = True
+        else:
+            self._tree_add(i, 1)
+
+    def _pop(self, index):
+        i, pos = self._locate(index)
+        chunk = self._chunks[i]
+        track = chunk.pop(pos)
+        self._len -= 1
+        if not chunk:
+            del self._chunks[i]
+            self._tree_dirty = True
+        else:
+            self._tree_add(i, -1)
+        return track
+
+    def popleft(self):
+        """Take the next track off the queue"""
+        if not self._len:
+            raise IndexError('pop from an empty queue')
+        track = self._pop(0)
+        self._count_user(track, -1)
+        return track
+
+    def remove(self, index):
+        """Remove and return the track at an index"""
+        track = self._pop(index)
+        self._count_user(track, -1)
+        return track
+
+    def move(self, source, destination):
+        """Move the track at source so it ends up at destination"""
+        track = self._pop(source)
+        self._insert(destination, track)
+        return track
+
+    def shuffle(self):
+        tracks = list(self)
+        random.shuffle(tracks)
+        self._chunks = [tracks[i:i + self._load] for i in range(0, len(tracks), self._load)]
+        self._tree_dirty = True
+
+    def clear(self):
+        self._chunks = []
+        self._tree = []
+        self._tree_dirty = False
+        self._len = 0
+        self._user_counts = {}
+
+    def memory_usage(self):
+        """Approximate bytes held by the queue, counting each string once"""
+        total = sys.getsizeof(self) + sys.getsizeof(self._chunks) + sum(map(sys.getsizeof, self._chunks))
+        seen = set()
+        for track in self:
+            total += sys.getsizeof(track)
+            for field in TRACK_FIELDS:
+                value = getattr(track, field)
+                if isinstance(value, str) and id(value) not in seen:
+                    seen.add(id(value))
+                    total += sys.getsizeof(value)
+        return total
+
+    def page(self, page, size):
+        """Tracks on a 1-based page, as (position, track) pairs"""
+        start = (page - 1) * size
+        if start >= self._len or start < 0:
+            return []
+        i, pos = self._locate(start)
+        rows = []
+        for chunk in islice(self._chunks, i, None):
+            for track in chunk[pos:pos + size - len(rows)]:
+                rows.append((start + len(rows) + 1, track))
+            if len(rows) >= size:
+                break
+            pos = 0
+        return rows
@@ -0,0 +1,301 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Priorities, lower goes first
+MODERATION = 0
+NORMAL = 1
+COSMETIC = 2
+PRIORITY_NAMES = {MODERATION: 'moderation', NORMAL: 'normal', COSMETIC: 'cosmetic'}
+
+# (requests, per seconds) for each kind of route, after Discord's per-route buckets
+ROUTE_LIMITS = {
+    'message': (5, 5.0),     # send, edit or delete messages in a channel
+    'reaction': (1, 0.25),   # add reactions in a channel
+    'purge': (1, 1.0),       # bulk delete in a channel
+    'channel': (5, 10.0),    # create or edit channels in a guild
+    'member': (5, 5.0),      # ban, kick, timeout or edit members in a guild
+}
+DEFAULT_LIMIT = (5, 5.0)
+
+# Upper bounds in seconds of the wait-time histogram buckets, the last one is open ended
+WAIT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class TokenBucket:
+    """capacity tokens refilled evenly over per seconds"""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, per, now):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token is available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self):
+        """Empty the bucket after the server rate limited us anyway"""
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Request:
+    __slots__ = ('priority', 'seq', 'route', 'func', 'future', 'coalesce', 'submitted')
+
+    def __init__(self, priority, seq, route, func, future, coalesce, submitted):
+        self.priority = priority
+        self.seq = seq
+        self.route = route
+        self.func = func
+        self.future = future
+        self.coalesce = coalesce
+        self.submitted = submitted
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Route:
+    __slots__ = ('bucket', 'queue')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.queue = []
+
+
+class OutboundScheduler:
+    """Proactive rate limiter for outbound Discord API calls.
+
+    Calls are queued per route, a (kind, major id) pair such as
+    ('reaction', channel_id), and each route has a token bucket sized
+    after Discord's limit for that kind of request, behind a global
+    bucket for the whole bot. A single task starts calls as soon as both
+    buckets have a token, most urgent first: moderation actions go ahead
+    of normal replies, which go ahead of cosmetic calls like reactions
+    and embed edits. Calls queued with the same coalesce key, such as
+    edits of one message, collapse into the latest one while they wait.
+
+    discord.py still retries a 429 on its own, this just keeps bursts
+    from running into one. Buckets refill margin slower than the real
+    limit to absorb network jitter, and a call that is rate limited anyway
+    empties its route's bucket.
+    """
+
+    def __init__(self, global_limit=(50, 1.0), limits=None, margin=0.1, idle_timeout=60.0):
+        self.limits = dict(ROUTE_LIMITS, **(limits or {}))
+        self.margin = margin
+        self.idle_timeout = idle_timeout
+        self._global = self._bucket(global_limit, time.monotonic())
+        self._routes = {}
+        self._running = set()
+        self._active = set()
+        self._coalesce = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+        self._last_sweep = time.monotonic()
+
+        # Stats
+        self.depth = {priority: 0 for priority in PRIORITY_NAMES}
+        self.max_depth = 0
+        self.waits = {priority: [0] * (len(WAIT_BUCKETS) + 1) for priority in PRIORITY_NAMES}
+        self.dispatched = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def _bucket(self, limit, now):
+        requests, per = limit
+        return TokenBucket(requests, per * (1 + self.margin), now)
+
+    def submit(self, route, func, priority=NORMAL, coalesce=None):
+        """Queue func() on a route, returns a future for its result.
+
+        func is called without arguments once the call may go out and
+        must return an awaitable.
+        """
+        if coalesce is not None:
+            request = self._coalesce.get(coalesce)
+            if request is not None:
+                # Only the latest version of the call is worth sending
+                request.func = func
+                self.coalesced += 1
+                return request.future
+
+        now = time.monotonic()
+        state = self._routes.get(route)
+        if state is None:
+            state = self._routes[route] = _Route(self._bucket(self.limits.get(route[0], DEFAULT_LIMIT), now))
+
+        future = asyncio.get_running_loop().create_future()
+        request = _Request(priority, next(self._seq), route, func, future, coalesce, now)
+        heapq.heappush(state.queue, request)
+        self._active.add(route)
+        if coalesce is not None:
+            self._coalesce[coalesce] = request
+
+        self.depth[priority] += 1
+        self.max_depth = max(self.max_depth, sum(self.depth.values()))
+        self._wakeup.set()
+        return future
+
+    async def call(self, route, func, priority=NORMAL, coalesce=None):
+        """Queue func() on a route and wait for its result"""
+        return await self.submit(route, func, priority, coalesce)
+
+    def post(self, route, func, priority=COSMETIC, coalesce=None):
+        """Queue func() without waiting for it, failures are only logged"""
+        future = self.submit(route, func, priority, coalesce)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f'Queued API call failed: {future.exception()}')
+
+    def _dispatch_ready(self, now):
+        """Start every call that may go out now, returns seconds until the next one could"""
+        while self._active:
+            global_delay = self._global.delay(now)
+            if global_delay:
+                return global_delay
+
+            best = None
+            next_delay = None
+            for route in self._active:
+                state = self._routes[route]
+                delay = state.bucket.delay(now)
+                if delay:
+                    next_delay = delay if next_delay is None else min(next_delay, delay)
+                elif best is None or state.queue[0] < self._routes[best].queue[0]:
+                    best = route
+            if best is None:
+                return next_delay
+
+            state = self._routes[best]
+            request = heapq.heappop(state.queue)
+            if not state.queue:
+                self._active.discard(best)
+            state.bucket.take()
+            self._global.take()
+            self._start(request, now)
+        return None
+
+    def _start(self, request, now):
+        if request.coalesce is not None:
+            self._coalesce.pop(request.coalesce, None)
+        self.depth[request.priority] -= 1
+        self.dispatched += 1
+
+        waited = now - request.submitted
+        histogram = self.waits[request.priority]
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if waited <= bound:
+                histogram[i] += 1
+                break
+        else:
+            histogram[-1] += 1
+
+        task = asyncio.ensure_future(self._execute(request))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _execute(self, request):
+        if request.future.cancelled():
+            return
+        try:
+            result = await request.func()
+        except Exception as e:
+            if getattr(e, 'status', None) == 429:
+                self.rate_limited += 1
+                state = self._routes.get(request.route)
+                if state is not None:
+                    state.bucket.drain()
+            self.failed += 1
+            if not request.future.done():
+                request.future.set_exception(e)
+        except BaseException:
+            # Cancelled mid-call, the caller must not wait forever
+            request.future.cancel()
+            raise
+        else:
+            if not request.future.done():
+                request.future.set_result(result)
+
+    def _sweep(self, now):
+        """Forget idle routes whose bucket has refilled"""
+        for route, state in list(self._routes.items()):
+            if not state.queue:
+                state.bucket.delay(now)
+                if state.bucket.tokens >= state.bucket.capacity:
+                    del self._routes[route]
+        self._last_sweep = now
+
+    async def _run(self):
+        while not self._stopping:
+            now = time.monotonic()
+            delay = self._dispatch_ready(now)
+            if now - self._last_sweep > self.idle_timeout:
+                self._sweep(now)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop dispatching and cancel calls still waiting"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        dropped = 0
+        for state in self._routes.values():
+            for request in state.queue:
+                request.future.cancel()
+                dropped += 1
+            state.queue = []
+        self._active.clear()
+        self._coalesce.clear()
+        self.depth = {priority: 0 for priority in PRIORITY_NAMES}
+        if dropped:
+            logger.info(f'Dropped {dropped} queued API calls on shutdown')
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        labels = [f'<={bound * 1000:g}ms' for bound in WAIT_BUCKETS] + [f'>{WAIT_BUCKETS[-1] * 1000:g}ms']
+        return {
+            'queue_depth': {PRIORITY_NAMES[p]: n for p, n in self.depth.items()},
+            'max_depth': self.max_depth,
+            'routes': len(self._routes),
+            'in_flight': len(self._running),
+            'dispatched': self.dispatched,
+            'coalesced': self.coalesced,
+            'rate_limited': self.rate_limited,
+            'failed': self.failed,
+            'wait_histogram': {
+                PRIORITY_NAMES[p]: dict(zip(labels, counts)) for p, counts in self.waits.items()
+            },
+        }
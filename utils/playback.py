@@ -0,0 +1,128 @@
+import discord
+
+from utils.audio import is_passthrough
+from utils.volume import VolumeSource, best_gain_stage
+
+
+class PlaybackController:
+    """Starts and controls voice playback for the Music cog.
+
+    Songs at 100% volume are sent as Opus, remuxed when possible. Other
+    volumes go through one of two engines: ffmpeg's volume filter, set
+    when the stream starts, or a PCM gain stage in this process, whose
+    volume can change mid-song. A song that started at 100% keeps playing
+    at 100% until it ends. volume_mode 'auto' uses the PCM stage when
+    numpy (in requirements.txt) is installed, else the filter.
+    """
+
+    def __init__(self, voice_clients, ffmpeg_options, volume_mode='auto'):
+        self.voice_clients = voice_clients
+        self.ffmpeg_options = ffmpeg_options
+        self.volumes = {}
+
+        stage, vectorized = best_gain_stage()
+        if volume_mode == 'auto':
+            volume_mode = 'pcm' if vectorized else 'filter'
+        self.volume_mode = volume_mode
+        self.gain_stage = stage
+
+    def create_source(self, guild_id, song):
+        """Audio source for a song, returns (source, passthrough)"""
+        codec = song['codec']
+        bitrate = song.get('bitrate') or 128
+        options = self.ffmpeg_options.get('options', '')
+
+        volume = self.volumes.get(guild_id, 1.0)
+        if volume != 1.0 and self.volume_mode == 'pcm':
+            source = VolumeSource(
+                discord.FFmpegPCMAudio(
+                    song['audio_url'],
+                    before_options=self.ffmpeg_options.get('before_options'),
+                    options=options
+                ),
+                volume,
+                stage=self.gain_stage
+            )
+            return source, False
+
+        if volume != 1.0:
+            # Applying a filter means decoding, so this stream is transcoded
+            options = f'{options} -af volume={volume}'
+            codec = None
+
+        source = discord.FFmpegOpusAudio(
+            song['audio_url'],
+            codec=codec,
+            bitrate=bitrate,
+            before_options=self.ffmpeg_options.get('before_options'),
+            options=options
+        )
+        return source, is_passthrough(codec)
+
+    def play(self, guild_id, song, after=None):
+        """Start a song on the guild's voice client, returns True if it is passed through"""
+        source, passthrough = self.create_source(guild_id, song)
+        self.voice_clients[guild_id].play(source, after=after)
+        return passthrough
+
+    def is_playing(self, guild_id):
+        vc = self.voice_clients.get(guild_id)
+        return vc is not None and vc.is_playing()
+
+    def is_paused(self, guild_id):
+        vc = self.voice_clients.get(guild_id)
+        return vc is not None and vc.is_paused()
+
+    def pause(self, guild_id):
+        if not self.is_playing(guild_id):
+            return False
+        self.voice_clients[guild_id].pause()
+        return True
+
+    def resume(self, guild_id):
+        if not self.is_paused(guild_id):
+            return False
+        self.voice_clients[guild_id].resume()
+        return True
+
+    def skip(self, guild_id):
+        if not self.is_playing(guild_id):
+            return False
+        # The voice client cleans up the source, which stops its ffmpeg
+        self.voice_clients[guild_id].stop()
+        return True
+
+    def set_volume(self, guild_id, level):
+        """Set a guild's volume (0.0-1.0), returns True if it applied to the current song
+
+        Otherwise it applies from the next song, without restarting this one.
+        """
+        # Back at 100% the next song is passed through again
+        if level == 1.0:
+            self.volumes.pop(guild_id, None)
+        else:
+            self.volumes[guild_id] = level
+
+        vc = self.voice_clients.get(guild_id)
+        source = vc.source if vc is not None else None
+        if isinstance(source, VolumeSource):
+            source.volume = level
+            return True
+        return False
+
+    async def disconnect(self, guild_id):
+        """Stop playback, leave voice and forget the guild's volume"""
+        self.volumes.pop(guild_id, None)
+        vc = self.voice_clients.pop(guild_id, None)
+        if vc is None:
+            return False
+        vc.stop()
+        await vc.disconnect()
+        return True
+
+    def active_streams(self):
+        """Number of ffmpeg processes feeding voice clients right now"""
+        return sum(
+            1 for vc in self.voice_clients.values()
+            if vc.source is not None and (vc.is_playing() or vc.is_paused())
+        )
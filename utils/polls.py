@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+
+class Poll:
+    """A poll's options and live tallies"""
+
+    __slots__ = ('poll_id', 'channel_id', 'message_id', 'question', 'options', 'author',
+                 'created_at', 'tallies', 'votes', 'last_used')
+
+    def __init__(self, poll_id, channel_id, message_id, question, options, author, created_at):
+        self.poll_id = poll_id
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.question = question
+        self.options = options
+        self.author = author
+        self.created_at = created_at
+        self.tallies = array('q', bytes(8 * len(options)))
+        self.votes = {}
+        self.last_used = time.monotonic()
+
+    @property
+    def total(self):
+        return sum(self.tallies)
+
+
+class PollEngine:
+    """Poll vote recorder.
+
+    Every poll in use keeps its tallies in an integer array and the option
+    each user voted for in a dict, so a vote is counted, or moved when a
+    user changes their mind, without touching the database. Votes are
+    written to poll_votes in one batched upsert per interval, where the
+    (poll_id, user_id) primary key keeps one vote per user.
+
+    Polls that received votes are passed to render(poll) once per
+    interval, so a poll message is edited at most every interval seconds
+    however fast votes arrive. Polls are loaded from the database on first
+    use and dropped from memory after idle_timeout seconds without votes.
+    """
+
+    def __init__(self, db, render=None, interval=2.0, idle_timeout=3600.0):
+        self.db = db
+        self.render = render
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+
+        self._polls = {}
+        self._loading = {}
+        self._pending = {}
+        self._dirty = set()
+
+        self._task = None
+        self._stopping = None
+        self._flush_lock = asyncio.Lock()
+
+        # Stats
+        self.votes = 0
+        self.unchanged = 0
+        self.flushes = 0
+        self.renders = 0
+
+    async def create(self, guild_id, channel_id, question, options, author):
+        """Store a new poll and return it"""
+        poll_id = await self.db.execute('''
+            INSERT INTO polls (guild_id, channel_id, question, options, author)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (guild_id, channel_id, question, json.dumps(options), author))
+        row = await self.db.fetchone('SELECT created_at FROM polls WHERE poll_id = ?', (poll_id,))
+        poll = Poll(poll_id, channel_id, None, question, options, author, row['created_at'])
+        self._polls[poll_id] = poll
+        return poll
+
+    async def set_message(self, poll, message_id):
+        poll.message_id = message_id
+        await self.db.execute('UPDATE polls SET message_id = ? WHERE poll_id = ?', (message_id, poll.poll_id))
+
+    async def get(self, poll_id):
+        """The poll with its current tallies, or None if it doesn't exist"""
+        poll = self._polls.get(poll_id)
+        if poll is not None:
+            return poll
+
+        # Share one load between votes that arrive together
+        task = self._loading.get(poll_id)
+        if task is None:
+            task = self._loading[poll_id] = asyncio.ensure_future(self._load(poll_id))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._loading.pop(poll_id, None)
+
+    async def _load(self, poll_id):
+        row = await self.db.fetchone('''
+            SELECT poll_id, channel_id, message_id, question, options, author, created_at
+            FROM polls WHERE poll_id = ?
+        ''', (poll_id,))
+        if row is None:
+            return None
+
+        poll = Poll(row['poll_id'], row['channel_id'], row['message_id'], row['question'],
+                    json.loads(row['options']), row['author'], row['created_at'])
+
+        def read_votes(conn):
+            return conn.execute(
+                'SELECT user_id, option FROM poll_votes WHERE poll_id = ?', (poll_id,)
+            ).fetchall()
+
+        for user_id, option in await self.db.run_read(read_votes):
+            if 0 <= option < len(poll.options):
+                poll.votes[user_id] = option
+                poll.tallies[option] += 1
+
+        # Votes that are waiting to be flushed are newer than the stored ones
+        for (pending_poll, user_id), option in self._pending.items():
+            if pending_poll == poll_id:
+                previous = poll.votes.get(user_id)
+                if previous is not None:
+                    poll.tallies[previous] -= 1
+                poll.votes[user_id] = option
+                poll.tallies[option] += 1
+
+        self._polls[poll_id] = poll
+        return poll
+
+    async def vote(self, poll_id, user_id, option):
+        """Record a vote, returns (poll, previous option) or (None, None) if the poll is gone"""
+        poll = await self.get(poll_id)
+        if poll is None or not 0 <= option < len(poll.options):
+            return None, None
+
+        poll.last_used = time.monotonic()
+        previous = poll.votes.get(user_id)
+        if previous == option:
+            self.unchanged += 1
+            return poll, previous
+
+        if previous is not None:
+            poll.tallies[previous] -= 1
+        poll.tallies[option] += 1
+        poll.votes[user_id] = option
+        self._pending[(poll_id, user_id)] = option
+        self._dirty.add(poll_id)
+        self.votes += 1
+        return poll, previous
+
+    async def flush(self):
+        """Write pending votes in one batched upsert"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            try:
+                await self.db.executemany('''
+                    INSERT INTO poll_votes (poll_id, user_id, option) VALUES (?, ?, ?)
+                    ON CONFLICT (poll_id, user_id) DO UPDATE SET option = excluded.option
+                ''', [(poll_id, user_id, option) for (poll_id, user_id), option in pending.items()])
+            except Exception as e:
+                logger.error(f'Failed to flush {len(pending)} poll votes: {e}')
+                # Keep votes cast since the failed flush, they are newer
+                pending.update(self._pending)
+                self._pending = pending
+                return 0
+            self.flushes += 1
+            return len(pending)
+
+    async def render_dirty(self):
+        """Re-render every poll that received votes since the last render"""
+        if self.render is None or not self._dirty:
+            return
+        polls = [self._polls[poll_id] for poll_id in self._dirty if poll_id in self._polls]
+        self._dirty = set()
+        results = await asyncio.gather(*(self.render(poll) for poll in polls), return_exceptions=True)
+        for poll, result in zip(polls, results):
+            if isinstance(result, Exception):
+                logger.error(f'Failed to update poll {poll.poll_id}: {result}')
+        self.renders += len(polls)
+
+    def _evict(self, now):
+        """Drop polls nobody has voted on for a while"""
+        for poll_id, poll in list(self._polls.items()):
+            if now - poll.last_used > self.idle_timeout and poll_id not in self._dirty:
+                del self._polls[poll_id]
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+                await self.render_dirty()
+                self._evict(time.monotonic())
+
+    def start(self):
+        """Start the periodic flush and render"""
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Stop and write out every pending vote"""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'loaded_polls': len(self._polls),
+            'pending_votes': len(self._pending),
+            'votes': self.votes,
+            'unchanged': self.unchanged,
+            'flushes': self.flushes,
+            'renders': self.renders,
+        }
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class GapStats:
+    """Silence between the end of one track and the start of the next"""
+
+    __slots__ = ('count', 'total', 'last', 'worst')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.worst = 0.0
+
+    def record(self, gap):
+        self.count += 1
+        self.total += gap
+        self.last = gap
+        self.worst = max(self.worst, gap)
+
+    def to_dict(self):
+        return {
+            'transitions': self.count,
+            'last_gap_ms': round(self.last * 1000, 1),
+            'avg_gap_ms': round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            'max_gap_ms': round(self.worst * 1000, 1),
+        }
+
+
+class Prefetcher:
+    """Resolves and probes upcoming tracks while the current one plays.
+
+    prepare(guild_id, song) is an async callable that refreshes the song's
+    stream URL and stores the probe result on it. The next lookahead songs
+    of a guild's queue are prepared in the background; probes across all
+    guilds share max_probes slots so a burst of queue changes can't spawn
+    a swarm of ffprobe processes.
+    """
+
+    def __init__(self, prepare, lookahead=2, max_probes=4):
+        self.prepare = prepare
+        self.lookahead = lookahead
+        self._probes = asyncio.Semaphore(max_probes)
+        self._tasks = {}
+        self._gaps = {}
+
+        # Stats
+        self.prepared = 0
+        self.failed = 0
+        self.warm_starts = 0
+        self.cold_starts = 0
+
+    def schedule(self, guild_id, queue):
+        """Start preparing the first lookahead songs of a queue"""
+        for i, song in enumerate(queue):
+            if i >= self.lookahead:
+                break
+            key = id(song)
+            if song.get('prepared') or key in self._tasks:
+                continue
+            task = asyncio.create_task(self._run(guild_id, song))
+            self._tasks[key] = (guild_id, song, task)
+            task.add_done_callback(lambda _, key=key: self._tasks.pop(key, None))
+
+    async def _run(self, guild_id, song):
+        async with self._probes:
+            try:
+                await self.prepare(guild_id, song)
+                song['prepared'] = True
+                self.prepared += 1
+            except Exception as e:
+                self.failed += 1
+                logger.debug(f"Prefetch failed for {song.get('title')}: {e}")
+
+    async def wait(self, song):
+        """Wait for a song's prefetch if one is in flight, return True if the song is warm"""
+        entry = self._tasks.get(id(song))
+        if entry is not None and entry[1] is song:
+            task = entry[2]
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                # Only swallow the prefetch being cancelled, not our caller
+                if not task.cancelled():
+                    raise
+        warm = bool(song.get('codec'))
+        if warm:
+            self.warm_starts += 1
+        else:
+            self.cold_starts += 1
+        return warm
+
+    def cancel(self, guild_id):
+        """Drop pending prefetches for a guild, e.g. when its queue is cleared"""
+        for key, (task_guild, _, task) in list(self._tasks.items()):
+            if task_guild == guild_id:
+                task.cancel()
+
+    def forget(self, guild_id):
+        """Drop a guild's gap stats once it leaves voice"""
+        self._gaps.pop(guild_id, None)
+
+    def record_gap(self, guild_id, ended_at):
+        """Record the gap from ended_at (time.perf_counter()) until now"""
+        stats = self._gaps.get(guild_id)
+        if stats is None:
+            stats = self._gaps[guild_id] = GapStats()
+        stats.record(time.perf_counter() - ended_at)
+
+    def gap_stats(self, guild_id):
+        stats = self._gaps.get(guild_id)
+        return stats.to_dict() if stats else GapStats().to_dict()
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'in_flight': len(self._tasks),
+            'prepared': self.prepared,
+            'failed': self.failed,
+            'warm_starts': self.warm_starts,
+            'cold_starts': self.cold_starts,
+        }
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+
+from utils.music_queue import MusicQueue, QueueFull, Track
+
+logger = logging.getLogger(__name__)
+
+# Track fields kept in a snapshot. Stream URLs expire and codecs come
+# with them, so restored tracks are resolved again when they come up.
+SNAPSHOT_FIELDS = ('id', 'title', 'url', 'duration', 'requester', 'requester_id', 'thumbnail')
+
+
+def encode_tracks(tracks):
+    """Compact JSON for a list of tracks: one array of field values per track"""
+    return json.dumps(
+        [[track[field] for field in SNAPSHOT_FIELDS] for track in tracks],
+        separators=(',', ':'),
+        ensure_ascii=False
+    )
+
+
+def decode_tracks(data):
+    tracks = []
+    for values in json.loads(data):
+        fields = dict(zip(SNAPSHOT_FIELDS, values))
+        tracks.append(Track(
+            video_id=fields['id'],
+            title=fields['title'],
+            url=fields['url'],
+            duration=fields['duration'] or 0,
+            requester=fields['requester'],
+            requester_id=fields['requester_id'],
+            thumbnail=fields['thumbnail']
+        ))
+    return tracks
+
+
+class QueueSnapshots:
+    """Keeps a copy of every guild's music queue in the database.
+
+    Callers mark a guild dirty whenever its queue or now-playing song
+    changes; every interval seconds only the dirty guilds are written,
+    one row per guild. state(guild_id) returns (tracks, volume) to save,
+    with the playing song first, or None once the guild has nothing to
+    keep, which deletes its row. Snapshots are read back one guild at a
+    time, the first time that guild uses a music command.
+    """
+
+    def __init__(self, db, state, interval=10):
+        self.db = db
+        self.state = state
+        self.interval = interval
+        self._dirty = set()
+        self._checked = set()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._stopping = None
+
+        # Stats
+        self.flushes = 0
+        self.written = 0
+        self.restored = 0
+
+    def mark(self, guild_id):
+        """Note that a guild's queue changed"""
+        self._dirty.add(guild_id)
+
+    async def flush(self):
+        """Write the dirty guilds' queues"""
+        async with self._flush_lock:
+            dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                return 0
+
+            upserts = []
+            deletes = []
+            for i, guild_id in enumerate(dirty):
+                state = self.state(guild_id)
+                if state is None:
+                    deletes.append((guild_id,))
+                else:
+                    tracks, volume = state
+                    upserts.append((guild_id, volume, encode_tracks(tracks)))
+                if i % 50 == 49:
+                    # Encoding big queues adds up, let other tasks run
+                    await asyncio.sleep(0)
+
+            try:
+                if upserts:
+                    await self.db.executemany('''
+                        INSERT INTO music_queue_snapshots (guild_id, volume, tracks, updated_at)
+                        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT (guild_id) DO UPDATE SET
+                            volume = excluded.volume,
+                            tracks = excluded.tracks,
+                            updated_at = excluded.updated_at
+                    ''', upserts)
+                if deletes:
+                    await self.db.executemany('DELETE FROM music_queue_snapshots WHERE guild_id = ?', deletes)
+            except Exception as e:
+                logger.error(f'Failed to save {len(dirty)} music queue snapshots: {e}')
+                # Try again next time, unless they changed again already
+                self._dirty |= dirty
+                return 0
+
+            self.flushes += 1
+            self.written += len(dirty)
+            return len(dirty)
+
+    async def restore(self, guild_id, max_size=1000, per_user=100):
+        """A guild's saved (queue, volume) the first time it is asked for, else None"""
+        if guild_id in self._checked:
+            return None
+        self._checked.add(guild_id)
+
+        row = await self.db.fetchone(
+            'SELECT volume, tracks FROM music_queue_snapshots WHERE guild_id = ?', (guild_id,)
+        )
+        if row is None:
+            return None
+        try:
+            tracks = decode_tracks(row['tracks'])
+        except (ValueError, TypeError, KeyError) as e:
+            logger.error(f'Discarding unreadable music queue snapshot for guild {guild_id}: {e}')
+            return None
+
+        queue = MusicQueue(max_size, per_user)
+        for track in tracks:
+            try:
+                queue.append(track)
+            except QueueFull:
+                # The limits were lowered since the snapshot was taken
+                continue
+        self.restored += 1
+        return queue, row['volume']
+
+    async def _flush_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self):
+        """Start the periodic flush"""
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the periodic flush and write out everything still pending"""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'pending': len(self._dirty),
+            'flushes': self.flushes,
+            'written': self.written,
+            'restored': self.restored,
+        }
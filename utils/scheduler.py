@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TimerScheduler:
+    """Runs many long timers from a single task.
+
+    Timers are (due time, key) entries in a heap, so adding one is
+    O(log n) and the task only ever sleeps until the earliest one.
+    Everything that is due is passed to fire(keys) in batches of up to
+    batch_size. Cancelled or rescheduled timers are skipped lazily when
+    they reach the top of the heap. Due times are time.time() timestamps;
+    the task wakes up at least every max_sleep seconds so a wall clock
+    change can't leave a timer sleeping far past its time.
+    """
+
+    def __init__(self, fire, batch_size=100, max_sleep=60.0):
+        self.fire = fire
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self._heap = []
+        self._due = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+        # Stats
+        self.fired = 0
+        self.batches = 0
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, key):
+        return key in self._due
+
+    def add(self, key, when):
+        """Schedule key to fire at when, replacing any earlier timer for it"""
+        self._due[key] = when
+        heapq.heappush(self._heap, (when, key))
+        if self._heap[0][1] == key:
+            # New earliest timer, the task may be sleeping past it
+            self._wakeup.set()
+
+    def bulk_add(self, timers):
+        """Schedule many (key, when) pairs at once"""
+        for key, when in timers:
+            self._due[key] = when
+            self._heap.append((when, key))
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def cancel(self, key):
+        self._due.pop(key, None)
+
+    def _take_due(self, now):
+        batch = []
+        heap = self._heap
+        while heap and heap[0][0] <= now and len(batch) < self.batch_size:
+            when, key = heapq.heappop(heap)
+            if self._due.get(key) == when:
+                del self._due[key]
+                batch.append(key)
+        return batch
+
+    def _compact(self):
+        # Too many cancelled entries left in the heap, rebuild it from the live ones
+        self._heap = [(when, key) for key, when in self._due.items()]
+        heapq.heapify(self._heap)
+
+    async def _run(self):
+        while not self._stopping:
+            batch = self._take_due(time.time())
+            if batch:
+                self.batches += 1
+                self.fired += len(batch)
+                try:
+                    await self.fire(batch)
+                except Exception as e:
+                    logger.error(f'Failed to fire {len(batch)} timers: {e}')
+                continue
+
+            if len(self._heap) > 2 * len(self._due) + 1024:
+                self._compact()
+
+            delay = self._heap[0][0] - time.time() if self._heap else self.max_sleep
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, min(delay, self.max_sleep)))
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop after the batch being fired, if any, has finished"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'pending': len(self._due),
+            'fired': self.fired,
+            'batches': self.batches,
+        }
@@ -0,0 +1,134 @@
+import time
+from collections import OrderedDict
+
+
+class GuildSettings:
+    """Settings row for one guild"""
+
+    __slots__ = (
+        'guild_id',
+        'ticket_category_id',
+        'suggestion_channel_id',
+        'log_channel_id',
+        'welcome_channel_id',
+        'cooldown_uses',
+        'cooldown_seconds',
+    )
+
+    def __init__(self, guild_id, ticket_category_id=None, suggestion_channel_id=None,
+                 log_channel_id=None, welcome_channel_id=None, cooldown_uses=None, cooldown_seconds=None):
+        self.guild_id = guild_id
+        self.ticket_category_id = ticket_category_id
+        self.suggestion_channel_id = suggestion_channel_id
+        self.log_channel_id = log_channel_id
+        self.welcome_channel_id = welcome_channel_id
+        # Command cooldown for the guild, None for the built-in defaults and 0 uses for none
+        self.cooldown_uses = cooldown_uses
+        self.cooldown_seconds = cooldown_seconds
+
+    @classmethod
+    def from_row(cls, row):
+        keys = row.keys()
+        return cls(**{name: row[name] for name in cls.__slots__ if name in keys})
+
+    # Mapping-style access so callers can keep using settings['key'] / settings.get('key')
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'<GuildSettings guild_id={self.guild_id}>'
+
+
+MISSING = object()
+
+
+class SettingsCache:
+    """LRU cache of guild settings with a TTL.
+
+    Guilds without a settings row are cached too, as None, so lookups for
+    unconfigured guilds do not hit the database either.
+    """
+
+    __slots__ = ('max_size', 'ttl', '_entries', 'hits', 'misses', 'evictions', 'invalidations', '_version')
+
+    def __init__(self, max_size=10_000, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def version(self):
+        """Changes on every invalidation, used to drop reads that raced a write"""
+        return self._version
+
+    def get(self, guild_id):
+        """Cached settings, None for a guild known to have none, or MISSING"""
+        entry = self._entries.get(guild_id)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        expires, settings = entry
+        if expires < time.monotonic():
+            del self._entries[guild_id]
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(guild_id)
+        self.hits += 1
+        return settings
+
+    def put(self, guild_id, settings, version=None):
+        """Cache settings unless an invalidation happened since version was read"""
+        if version is not None and version != self._version:
+            return
+        self._entries[guild_id] = (time.monotonic() + self.ttl, settings)
+        self._entries.move_to_end(guild_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, guild_id):
+        """Forget a guild's settings after they were written"""
+        self._version += 1
+        self.invalidations += 1
+        self._entries.pop(guild_id, None)
+
+    def clear(self):
+        self._version += 1
+        self._entries.clear()
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
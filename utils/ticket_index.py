@@ -0,0 +1,80 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TicketIndex:
+    """In-memory index of open tickets.
+
+    Maps ticket channels to ticket ids and (guild_id, user_id) to the
+    user's open ticket, so ticket commands never query the tickets table
+    to find out where they are. It is bulk-loaded at startup with a few
+    keyset-paginated queries and kept in sync as tickets open and close.
+    """
+
+    def __init__(self, db, batch_size=5000):
+        self.db = db
+        self.batch_size = batch_size
+        self._by_channel = {}
+        self._by_user = {}
+        self._tickets = {}
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self._tickets)
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set()
+
+    async def wait_ready(self):
+        await self._ready.wait()
+
+    async def load(self):
+        """Bulk-load all open tickets from the database"""
+        last_id = 0
+        loaded = 0
+        try:
+            while True:
+                rows = await self.db.fetchall('''
+                    SELECT ticket_id, guild_id, user_id, channel_id FROM tickets
+                    WHERE status = 'open' AND ticket_id > ?
+                    ORDER BY ticket_id
+                    LIMIT ?
+                ''', (last_id, self.batch_size))
+                for row in rows:
+                    self.add(row['ticket_id'], row['guild_id'], row['user_id'], row['channel_id'])
+                loaded += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+                last_id = rows[-1]['ticket_id']
+            logger.info(f'Loaded {loaded} open tickets')
+        finally:
+            # Never leave ticket commands waiting on a failed load
+            self._ready.set()
+
+    def add(self, ticket_id, guild_id, user_id, channel_id):
+        """Record an open ticket"""
+        self._tickets[ticket_id] = (guild_id, user_id, channel_id)
+        self._by_channel[channel_id] = ticket_id
+        self._by_user[(guild_id, user_id)] = ticket_id
+
+    def remove(self, ticket_id):
+        """Forget a ticket once it is closed"""
+        entry = self._tickets.pop(ticket_id, None)
+        if entry is None:
+            return
+        guild_id, user_id, channel_id = entry
+        if self._by_channel.get(channel_id) == ticket_id:
+            del self._by_channel[channel_id]
+        if self._by_user.get((guild_id, user_id)) == ticket_id:
+            del self._by_user[(guild_id, user_id)]
+
+    def by_channel(self, channel_id):
+        """Ticket id for a ticket channel, or None"""
+        return self._by_channel.get(channel_id)
+
+    def by_user(self, guild_id, user_id):
+        """A user's open ticket id in a guild, or None"""
+        return self._by_user.get((guild_id, user_id))
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+_YOUTUBE_ID = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+
+
+def normalize_query(query):
+    """Cache key for a /play query: the video id for YouTube links, else the folded text"""
+    match = _YOUTUBE_ID.search(query)
+    if match:
+        return f'id:{match.group(1)}'
+    return ' '.join(query.casefold().split())
+
+
+def stream_expiry(url):
+    """Unix time a googlevideo stream URL stops working, or None if it doesn't say"""
+    if not url:
+        return None
+    try:
+        expire = parse_qs(urlparse(url).query).get('expire')
+        if not expire:
+            # Some stream URLs carry their parameters as path segments
+            match = re.search(r'/expire/(\d+)', url)
+            return int(match.group(1)) if match else None
+        return int(expire[0])
+    except ValueError:
+        return None
+
+
+def stream_is_fresh(url, margin=60):
+    """False once a stream URL is within margin seconds of expiring"""
+    expiry = stream_expiry(url)
+    return expiry is None or expiry - margin > time.time()
+
+
+class TrackCache:
+    """Shared LRU cache of resolved track metadata.
+
+    Tracks are stored once per video id, and normalized queries are
+    aliases pointing at a video id, so "/play never gonna give you up" and
+    the video's URL share an entry. Entries are kept when their stream URL
+    expires: the metadata is still good, only the URL needs a refresh.
+    The cache can be persisted to a JSON file between restarts.
+    """
+
+    def __init__(self, max_size=5000, path=None):
+        self.max_size = max_size
+        self.path = Path(path) if path else None
+        self._tracks = OrderedDict()
+        self._aliases = OrderedDict()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+        if self.path:
+            self.load()
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def get(self, query):
+        """Cached track info for a query, or None"""
+        key = normalize_query(query)
+        video_id = key[3:] if key.startswith('id:') else self._aliases.get(key)
+        info = self._tracks.get(video_id) if video_id else None
+        if info is None:
+            self.misses += 1
+            return None
+
+        self._tracks.move_to_end(video_id)
+        if key in self._aliases:
+            self._aliases.move_to_end(key)
+        self.hits += 1
+        return info
+
+    def put(self, query, info):
+        """Cache track info under its video id and the query that found it"""
+        video_id = info.get('id')
+        if not video_id:
+            return
+
+        self._tracks[video_id] = info
+        self._tracks.move_to_end(video_id)
+
+        key = normalize_query(query)
+        if key != f'id:{video_id}':
+            self._aliases[key] = video_id
+            self._aliases.move_to_end(key)
+
+        while len(self._tracks) > self.max_size:
+            self._tracks.popitem(last=False)
+        # Aliases to evicted tracks are dropped lazily, just bound their number
+        while len(self._aliases) > self.max_size * 2:
+            self._aliases.popitem(last=False)
+
+    def update_stream(self, video_id, url):
+        """Store a refreshed stream URL for a cached track"""
+        info = self._tracks.get(video_id)
+        if info is not None:
+            info['url'] = url
+        self.refreshes += 1
+
+    def load(self):
+        """Load the cache from disk"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f'Failed to load track cache from {self.path}: {e}')
+            return
+
+        for video_id, info in data.get('tracks', [])[-self.max_size:]:
+            self._tracks[video_id] = info
+        for key, video_id in data.get('aliases', []):
+            if video_id in self._tracks:
+                self._aliases[key] = video_id
+        logger.info(f'Loaded {len(self._tracks)} cached tracks')
+
+    def save(self):
+        """Write the cache to disk, atomically replacing the old file"""
+        if not self.path:
+            return
+        data = {
+            'tracks': list(self._tracks.items()),
+            'aliases': [(key, video_id) for key, video_id in self._aliases.items() if video_id in self._tracks],
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.error(f'Failed to save track cache to {self.path}: {e}')
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'size': len(self._tracks),
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+        }
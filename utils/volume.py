@@ -0,0 +1,76 @@
+from array import array
+
+import discord
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+
+def gain_numpy(frame, volume):
+    """Scale 16-bit PCM with numpy"""
+    samples = numpy.frombuffer(frame, dtype=numpy.int16) * numpy.float32(volume)
+    if volume > 1.0:
+        numpy.clip(samples, -32768, 32767, out=samples)
+    return samples.astype(numpy.int16).tobytes()
+
+
+def gain_array(frame, volume):
+    """Scale 16-bit PCM in pure Python, the slow fallback"""
+    samples = array('h', frame)
+    if volume > 1.0:
+        samples = array('h', [max(-32768, min(32767, int(s * volume))) for s in samples])
+    else:
+        samples = array('h', [int(s * volume) for s in samples])
+    return samples.tobytes()
+
+
+# Fastest first
+GAIN_STAGES = {
+    name: func for name, func in (
+        ('numpy', gain_numpy if numpy is not None else None),
+        ('array', gain_array),
+    ) if func is not None
+}
+
+
+def best_gain_stage():
+    """Name of the fastest gain stage available, and whether it is vectorized"""
+    name = next(iter(GAIN_STAGES))
+    return name, name != 'array'
+
+
+class VolumeSource(discord.AudioSource):
+    """PCM source with a gain stage, the volume can change while it plays.
+
+    Unlike discord.PCMVolumeTransformer the gain is done with numpy when
+    it is installed, and frames at 100% volume are passed through
+    untouched.
+    """
+
+    def __init__(self, original, volume=1.0, stage=None):
+        self.original = original
+        self.volume = volume
+        self._gain = GAIN_STAGES[stage or best_gain_stage()[0]]
+
+    @property
+    def volume(self):
+        return self._volume
+
+    @volume.setter
+    def volume(self, value):
+        self._volume = max(0.0, min(2.0, float(value)))
+
+    def read(self):
+        frame = self.original.read()
+        if not frame or self._volume == 1.0:
+            return frame
+        return self._gain(frame, self._volume)
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        self.original.cleanup()
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import random
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+XP_PER_LEVEL = 1000
+
+
+def level_for_xp(xp):
+    """Level reached with the given amount of XP"""
+    return xp // XP_PER_LEVEL + 1
+
+
+class XPEngine:
+    """Message XP accumulator.
+
+    XP earned from messages is kept in memory and written to the users
+    table in bulk upserts, on a timer and on shutdown, instead of one
+    query per message. Each (guild_id, user_id) gets a slot index into
+    compact arrays holding the pending XP and the time of the last award,
+    which is also what the per-user cooldown is checked against.
+
+    Memory is bounded by max_slots: when the table is full, slots with no
+    pending XP whose cooldown has expired are dropped, and if that is not
+    enough a flush is started and new users are ignored until it finishes.
+    """
+
+    def __init__(self, db, cooldown=60.0, min_xp=15, max_xp=25,
+                 flush_interval=30.0, max_slots=200_000, flush_chunk=5000):
+        self.db = db
+        self.cooldown = cooldown
+        self.min_xp = min_xp
+        self.max_xp = max_xp
+        self.flush_interval = flush_interval
+        self.max_slots = max_slots
+        self.flush_chunk = flush_chunk
+
+        self._slots = {}
+        self._keys = []
+        self._pending = array('q')
+        self._last = array('d')
+        self._dirty = 0
+        self._full = False
+
+        self._listeners = []
+        self._task = None
+        self._stopping = None
+        self._flush_lock = asyncio.Lock()
+
+        # Stats
+        self.messages = 0
+        self.awarded = 0
+        self.dropped = 0
+        self.flushes = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def pending(self):
+        """Number of users with XP waiting to be flushed"""
+        return self._dirty
+
+    def add_listener(self, callback):
+        """Call callback(rows) after every flush with (guild_id, user_id, gained_xp) rows"""
+        self._listeners.append(callback)
+
+    def record(self, guild_id, user_id, now=None):
+        """Record a message and return the XP awarded for it (0 while on cooldown)"""
+        self.messages += 1
+        if now is None:
+            now = time.monotonic()
+
+        key = (guild_id, user_id)
+        slot = self._slots.get(key)
+        if slot is None:
+            if len(self._keys) >= self.max_slots and (self._full or not self._compact(now)):
+                self.dropped += 1
+                return 0
+            slot = len(self._keys)
+            self._slots[key] = slot
+            self._keys.append(key)
+            self._pending.append(0)
+            self._last.append(now)
+        elif now - self._last[slot] < self.cooldown:
+            return 0
+        else:
+            self._last[slot] = now
+
+        gained = self.min_xp + int(random.random() * (self.max_xp - self.min_xp + 1))
+        if not self._pending[slot]:
+            self._dirty += 1
+        self._pending[slot] += gained
+        self.awarded += gained
+        return gained
+
+    def _compact(self, now):
+        """Drop idle slots to make room, return True if there is space"""
+        keep = [
+            i for i, last in enumerate(self._last)
+            if self._pending[i] or now - last < self.cooldown
+        ]
+        if len(keep) < len(self._keys):
+            self._keys = [self._keys[i] for i in keep]
+            self._pending = array('q', (self._pending[i] for i in keep))
+            self._last = array('d', (self._last[i] for i in keep))
+            self._slots = {key: i for i, key in enumerate(self._keys)}
+
+        # Only count as room if enough was freed to amortise the scan
+        self._full = len(self._keys) > self.max_slots * 0.9
+        if not self._full:
+            return True
+
+        # Still full of unflushed XP, flush in the background
+        if not self._flush_lock.locked():
+            asyncio.ensure_future(self.flush())
+        return len(self._keys) < self.max_slots
+
+    def _take_pending(self):
+        """Collect and reset pending XP"""
+        rows = []
+        pending = self._pending
+        for i, key in enumerate(self._keys):
+            gained = pending[i]
+            if gained:
+                rows.append((key[0], key[1], gained))
+                pending[i] = 0
+        self._dirty = 0
+        return rows
+
+    def _restore_pending(self, rows):
+        """Put XP from a failed flush back so it is retried"""
+        for guild_id, user_id, gained in rows:
+            slot = self._slots.get((guild_id, user_id))
+            if slot is None:
+                slot = len(self._keys)
+                self._slots[(guild_id, user_id)] = slot
+                self._keys.append((guild_id, user_id))
+                self._pending.append(0)
+                self._last.append(0.0)
+            if not self._pending[slot]:
+                self._dirty += 1
+            self._pending[slot] += gained
+
+    async def flush(self):
+        """Write all pending XP to the database in one bulk upsert"""
+        async with self._flush_lock:
+            rows = self._take_pending()
+            if not rows:
+                return 0
+
+            # Write in chunks so other writes can interleave with a big flush
+            for start in range(0, len(rows), self.flush_chunk):
+                chunk = rows[start:start + self.flush_chunk]
+                try:
+                    await self.db.executemany(f'''
+                        INSERT INTO users (guild_id, user_id, xp, level)
+                        VALUES (?1, ?2, ?3, ?3 / {XP_PER_LEVEL} + 1)
+                        ON CONFLICT (guild_id, user_id) DO UPDATE SET
+                            xp = users.xp + excluded.xp,
+                            level = (users.xp + excluded.xp) / {XP_PER_LEVEL} + 1
+                    ''', chunk)
+                except Exception as e:
+                    logger.error(f'Failed to flush XP for {len(rows) - start} users: {e}')
+                    self._restore_pending(rows[start:])
+                    rows = rows[:start]
+                    break
+
+            if not rows:
+                return 0
+
+            self.flushes += 1
+            for callback in self._listeners:
+                try:
+                    callback(rows)
+                except Exception as e:
+                    logger.error(f'XP flush listener failed: {e}')
+
+            # Forget users whose cooldown has expired
+            self._compact(time.monotonic())
+            return len(rows)
+
+    async def _flush_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self):
+        """Start the periodic flush"""
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the periodic flush and write out everything still pending"""
+        if self._task is not None:
+            # Let a flush in progress finish rather than cancelling it mid-write
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def get_stats(self):
+        """Get stats for the dashboard"""
+        return {
+            'tracked_users': len(self._slots),
+            'pending_users': self._dirty,
+            'messages': self.messages,
+            'awarded_xp': self.awarded,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+        }
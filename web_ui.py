@@ -24,6 +24,7 @@ class WebDashboard:
             return await render_template('index.html', 
                                        bot=self.bot,
                                        guilds=len(self.bot.guilds),
+                                       cog_timings=getattr(self.bot, 'cog_timings', []),
                                        uptime=datetime.now())
         
         @self.app.route('/dashboard')
@@ -37,16 +38,29 @@ class WebDashboard:
         async def music_control():
             # Get music status from all guilds
             music_data = []
+            lookup_stats = None
+            resource_stats = None
+            music_cog = self.bot.get_cog('Music')
             for guild in self.bot.guilds:
                 # Check if music cog is active in this guild
-                music_cog = self.bot.get_cog('Music')
                 if music_cog:
                     status = music_cog.get_guild_status(guild.id)
                     if status:
+                        status['name'] = guild.name
                         music_data.append(status)
             
+            # The page controls music_data[0]: the guild picked in the selector, else one that is playing
+            selected = request.args.get('guild', type=int)
+            music_data.sort(key=lambda status: (status['guild_id'] != selected, status['now_playing'] is None))
+            
+            if music_cog:
+                lookup_stats = music_cog.get_extractor_stats()
+                resource_stats = music_cog.get_resource_stats()
+            
             return await render_template('music.html',
                                        music_data=music_data,
+                                       lookup_stats=lookup_stats,
+                                       resource_stats=resource_stats,
                                        bot=self.bot)
         
         @self.app.route('/tickets')
@@ -66,8 +80,28 @@ class WebDashboard:
         @self.app.route('/settings')
         async def settings():
             bot_settings = await self.db.get_bot_settings()
+            
+            # Cooldown of the guild picked in the selector, empty fields mean the built-in defaults.
+            # Read directly so page loads don't count towards the settings cache stats
+            guilds = [{'guild_id': guild.id, 'name': guild.name} for guild in self.bot.guilds]
+            selected = request.args.get('guild', type=int)
+            if selected not in {guild['guild_id'] for guild in guilds}:
+                selected = guilds[0]['guild_id'] if guilds else None
+            cooldown = {'guild_id': selected, 'uses': None, 'seconds': None}
+            if selected is not None:
+                row = await self.db.fetchone(
+                    'SELECT cooldown_uses, cooldown_seconds FROM guild_settings WHERE guild_id = ?', (selected,)
+                )
+                if row:
+                    cooldown['uses'] = row['cooldown_uses']
+                    cooldown['seconds'] = row['cooldown_seconds']
+            
             return await render_template('settings.html',
                                        settings=bot_settings,
+                                       cache_stats=self.db.settings_cache.get_stats(),
+                                       guilds=guilds,
+                                       cooldown=cooldown,
+                                       cooldown_stats=self.bot.cooldowns.get_stats(),
                                        bot=self.bot)
         
         # API endpoints
@@ -83,11 +117,36 @@ class WebDashboard:
             }
             return jsonify(stats)
         
+        @self.app.route('/api/settings/cooldowns', methods=['POST'])
+        async def api_cooldowns():
+            data = await request.get_json()
+            try:
+                guild_id = int(data['guild_id'])
+                # Blank fields go back to the built-in defaults
+                uses = int(data['uses']) if data.get('uses') not in (None, '') else None
+                seconds = float(data['seconds']) if data.get('seconds') not in (None, '') else None
+            except (KeyError, TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'Invalid cooldown'})
+            if (uses is not None and uses < 0) or (seconds is not None and seconds <= 0):
+                return jsonify({'success': False, 'error': 'Invalid cooldown'})
+            
+            await self.db.update_guild_settings(guild_id, cooldown_uses=uses, cooldown_seconds=seconds)
+            return jsonify({'success': True})
+        
+        @self.app.route('/api/outbound')
+        async def api_outbound():
+            # Queue depth and wait times of rate limited API calls
+            return jsonify(self.bot.outbound.get_stats())
+        
         @self.app.route('/api/music/control', methods=['POST'])
         async def api_music_control():
             data = await request.get_json()
             action = data.get('action')
-            guild_id = data.get('guild_id')
+            # Sent as a string, snowflakes don't fit in a JavaScript number
+            try:
+                guild_id = int(data.get('guild_id'))
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'Invalid guild'})
             
             # Control music playback
             music_cog = self.bot.get_cog('Music')